@@ -0,0 +1,48 @@
+"""
+    Measures the time to import conf_tools (which is lazy) and the time
+    to import everything (by using ConfigMaster), each in a new process.
+    Exits with an error if the import takes more than the threshold.
+
+        python benchmarks/import_bench.py [nruns] [threshold in seconds]
+"""
+import os
+import subprocess
+import sys
+
+script = """
+import time
+t0 = time.time()
+import conf_tools
+%s
+print(time.time() - t0)
+"""
+
+
+def time_import(statement, nruns):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    times = []
+    for _ in range(nruns):
+        out = subprocess.check_output([sys.executable, '-c',
+                                       script % statement], env=env,
+                                      stderr=subprocess.STDOUT)
+        times.append(float(out.decode().strip().split('\n')[-1]))
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    nruns = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    threshold = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    t_lazy = time_import('', nruns)
+    t_full = time_import('conf_tools.ConfigMaster', nruns)
+    print('median of %d runs' % nruns)
+    print('  import conf_tools:         %8.3f s' % t_lazy)
+    print('  ... and use ConfigMaster:  %8.3f s' % t_full)
+    if t_lazy > threshold:
+        print('The import took more than %.3f s.' % threshold)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+    Compares the time to look up entries with the default mode (a copy
+    per call), with ObjectSpec.read_only (shared read-only views) and
+    with get_mutable() (a deep copy per call).
+
+        python benchmarks/lookup_bench.py [nentries] [nlookups]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from conf_tools import ConfigMaster, GlobalConfig
+from conf_tools.objspec import ObjectSpec
+
+
+def generate_config(dirname, nentries):
+    with open(os.path.join(dirname, 'a.things.yaml'), 'w') as f:
+        for j in range(nentries):
+            f.write('- id: thing-%d\n' % j)
+            f.write('  desc: "Generated entry %d"\n' % j)
+            f.write('  code:\n')
+            f.write('  - package.module.Thing\n')
+            f.write('  - {size: %d, tags: [a, b, c], nested: {x: [1, 2]}}\n'
+                    % j)
+        f.write('- id: "tpl-${n}"\n')
+        f.write('  desc: "Generated from a template"\n')
+        f.write('  code: [package.module.Thing, {size: "${n}", l: [1, 2]}]\n')
+
+
+def time_lookups(dirname, ids, nlookups, read_only, mutable):
+    GlobalConfig.clear_for_tests()
+    ObjectSpec.read_only = read_only
+    master = ConfigMaster('bench')
+    things = master.add_class('things', '*.things.yaml')
+    master.load(dirname)
+    get = things.get_mutable if mutable else things.__getitem__
+    for i in ids:  # warm up
+        get(i)
+    t0 = time.time()
+    for k in range(nlookups):
+        get(ids[k % len(ids)])
+    return time.time() - t0
+
+
+def main():
+    nentries = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    nlookups = int(sys.argv[2]) if len(sys.argv) > 2 else 100000
+    dirname = tempfile.mkdtemp()
+    try:
+        generate_config(dirname, nentries)
+        literal = ['thing-%d' % j for j in range(nentries)]
+        templated = ['tpl-%d' % j for j in range(nentries)]
+        print('%d lookups' % nlookups)
+        for what, ids in [('literal', literal), ('template', templated)]:
+            t_copy = time_lookups(dirname, ids, nlookups, False, False)
+            t_ro = time_lookups(dirname, ids, nlookups, True, False)
+            t_mut = time_lookups(dirname, ids, nlookups, True, True)
+            print('  %s entries:' % what)
+            print('    copy per call:  %8.3f s' % t_copy)
+            print('    read_only:      %8.3f s' % t_ro)
+            print('    get_mutable():  %8.3f s' % t_mut)
+    finally:
+        ObjectSpec.read_only = False
+        shutil.rmtree(dirname)
+
+
+if __name__ == '__main__':
+    main()
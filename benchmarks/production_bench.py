@@ -0,0 +1,77 @@
+"""
+    Measures the overhead of the PyContracts checks on the hot paths, by 
+    running the same workload with and without CONF_TOOLS_PRODUCTION=1.
+
+        python benchmarks/production_bench.py [nentries] [nlookups]
+"""
+import os
+import subprocess
+import sys
+
+# Run in a separate process, because the mode is decided at import time.
+workload = """
+import os, shutil, sys, tempfile, time
+from conf_tools import ConfigMaster
+from conf_tools.utils import expand_string
+
+nentries, nlookups = int(sys.argv[1]), int(sys.argv[2])
+dirname = tempfile.mkdtemp()
+try:
+    with open(os.path.join(dirname, 'a.things.yaml'), 'w') as f:
+        for j in range(nentries):
+            f.write('- id: thing-%d\\n  desc: d\\n  code: [m.C, {x: %d}]\\n'
+                    % (j, j))
+        f.write('- id: "tpl-${n}"\\n  desc: d\\n  code: [m.C, {x: "${n}"}]\\n')
+    master = ConfigMaster('bench')
+    things = master.add_class('things', '*.things.yaml')
+    master.load(dirname)
+    ids = ['thing-%d' % j for j in range(nentries)]
+    tpl = ['tpl-%d' % j for j in range(nentries)]
+
+    def timeit(f):
+        for k in range(nentries):  # warm up: reads the files
+            f(k)
+        t0 = time.time()
+        for k in range(nlookups):
+            f(k)
+        return time.time() - t0
+
+    results = [
+        ('__getitem__ (literal)', timeit(lambda k: things[ids[k % nentries]])),
+        ('__getitem__ (template)', timeit(lambda k: things[tpl[k % nentries]])),
+        ('__contains__', timeit(lambda k: ids[k % nentries] in things)),
+        ('expand_string', timeit(lambda k: expand_string('thing-1*', ids))),
+    ]
+    for name, t in results:
+        print('%s %f' % (name, t))
+finally:
+    shutil.rmtree(dirname)
+"""
+
+
+def run(production, nentries, nlookups):
+    env = dict(os.environ)
+    env['CONF_TOOLS_PRODUCTION'] = '1' if production else '0'
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    out = subprocess.check_output([sys.executable, '-c', workload,
+                                   str(nentries), str(nlookups)], env=env)
+    res = []
+    for line in out.decode().strip().split('\n'):
+        name, t = line.rsplit(' ', 1)
+        res.append((name, float(t)))
+    return res
+
+
+def main():
+    nentries = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    nlookups = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    checked = run(False, nentries, nlookups)
+    production = run(True, nentries, nlookups)
+    print('%d entries, %d calls each' % (nentries, nlookups))
+    print('  %-24s %10s %10s %8s' % ('', 'checked', 'production', 'speedup'))
+    for (name, t1), (_, t2) in zip(checked, production):
+        print('  %-24s %9.3fs %9.3fs %7.1fx' % (name, t1, t2, t1 / t2))
+
+
+if __name__ == '__main__':
+    main()
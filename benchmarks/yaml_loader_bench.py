@@ -0,0 +1,58 @@
+"""
+    Compares the time to load a generated tree of config files
+    with the libyaml loader and with the pure-Python loader.
+
+        python benchmarks/yaml_loader_bench.py [nfiles] [nentries]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from conf_tools import ConfToolsGlobal, load_entries_from_dir
+from conf_tools.formats import CSafeLoader
+
+
+def generate_tree(dirname, nfiles, nentries):
+    for i in range(nfiles):
+        sub = os.path.join(dirname, 'group%02d' % (i % 10))
+        if not os.path.exists(sub):
+            os.makedirs(sub)
+        with open(os.path.join(sub, 'f%04d.things.yaml' % i), 'w') as f:
+            for j in range(nentries):
+                f.write('- id: thing-%d-%d\n' % (i, j))
+                f.write('  desc: "Generated entry %d of file %d"\n' % (j, i))
+                f.write('  code:\n')
+                f.write('  - package.module.Thing\n')
+                f.write('  - {size: %d, scale: %f, tags: [a, b, c]}\n' %
+                        (j, j * 0.5))
+
+
+def time_load(dirname, use_libyaml):
+    ConfToolsGlobal.use_libyaml = use_libyaml
+    t0 = time.time()
+    n = len(list(load_entries_from_dir(dirname, '*.things.yaml')))
+    return n, time.time() - t0
+
+
+def main():
+    nfiles = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    nentries = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    if CSafeLoader is None:
+        print('libyaml is not available; only the pure-Python loader works.')
+    dirname = tempfile.mkdtemp()
+    try:
+        generate_tree(dirname, nfiles, nentries)
+        n, t_python = time_load(dirname, use_libyaml=False)
+        n, t_libyaml = time_load(dirname, use_libyaml=True)
+        print('%d entries in %d files' % (n, nfiles))
+        print('  pure-Python loader: %8.3f s' % t_python)
+        print('  libyaml loader:     %8.3f s' % t_libyaml)
+        print('  speedup:            %8.1fx' % (t_python / t_libyaml))
+    finally:
+        shutil.rmtree(dirname)
+
+
+if __name__ == '__main__':
+    main()
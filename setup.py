@@ -52,6 +52,10 @@ setup(name='ConfTools',
           'PyYAML',
           'PyContracts>=1.2,<2',
           'six',
+          # concurrent.futures
+          'futures; python_version < "3"',
+          # os.scandir
+          'scandir; python_version < "3.5"',
       ],
       tests_require=['nose'],
       entry_points={},
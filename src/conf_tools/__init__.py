@@ -1,37 +1,120 @@
 __version__ = '1.9.9'
 
+import importlib
 import logging
+import sys
 
-logging.basicConfig()
+# Note: importing conf_tools does not configure logging (it used to call
+# logging.basicConfig() and set the level to DEBUG); that is up to the
+# application, for example:
+#
+#     logging.basicConfig()
+#     logging.getLogger('conf_tools').setLevel(logging.DEBUG)
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
 
-logger.info('conf_tools %s' % __version__)
+ID_FIELD = 'id'
 
-from . import utils
 
-from contracts import (new_contract)
+class ConfToolsGlobal(object):
+    log_instance_error = True
+    # Use libyaml to parse the files, if available.
+    use_libyaml = True
 
-new_contract("id_or_spec", "dict|str")
 
-ID_FIELD = 'id'
+# The public names, and the submodules that define them. They are
+# imported only when first used (see __getattr__), so that importing
+# conf_tools does not import PyYAML, PyContracts and all the submodules.
+# Before Python 3.7 (no module __getattr__) they are imported right away.
+_lazy_names = {
+    'aio': ['AsyncMasterMixin', 'AsyncSpecMixin'],
+    'bundle': ['compile_bundle', 'load_bundle'],
+    'checks': ['check_has_exactly_one', 'check_necessary', 'wrap_check'],
+    'code_desc': ['GenericCall', 'GenericInstance', 'GenericIsinstance',
+                  'check_generic_code_desc', 'check_type',
+                  'instance_generic_code_desc'],
+    'code_specs': ['check_valid_code_spec', 'format_code_spec', 'format_yaml',
+                   'instantiate_spec'],
+    'entries_cache': ['EntriesCache', 'IdIndex', 'get_entries_cache',
+                      'get_id_index', 'set_entries_cache_dir'],
+    'exceptions': ['BadConfig', 'ConfToolsException', 'InstanceManyError',
+                   'ResourceNotFound', 'SemanticMistake',
+                   'SemanticMistakeKeyNotFound', 'SyntaxMistake'],
+    'formats': ['format_patterns', 'get_format_loader', 'register_format'],
+    'global_config': ['ConfigState', 'GlobalConfig', 'reset_config'],
+    'instance_cache': ['InstanceCache', 'spec_fingerprint'],
+    'instantiate_utils': ['import_name', 'instantiate'],
+    'load_entries': ['check_entries', 'enumerate_entries_from_data',
+                     'enumerate_entries_from_file', 'load_entries_from_dir',
+                     'load_entries_from_file', 'load_entries_from_files',
+                     'parse_entries', 'write_entries'],
+    'master': ['ConfigMaster'],
+    'objspec': ['ObjectSpec'],
+    'parallel_load': ['ParallelLoader'],
+    'patterns': ['CompiledTemplate', 'SubstitutionPlan', 'TemplateDispatcher',
+                 'compile_template', 'is_pattern', 'pattern_matches',
+                 'recursive_subst'],
+    'resolve': ['CodeGraph', 'REF_FIELD', 'instantiate_spec_resolved'],
+    'special_subst': ['check_exists', 'intepret_as_filename', 'make_relative',
+                      'recursive_subst_keys', 'substitute_special',
+                      'substitute_special_keys'],
+    'utils': ['expand_environment', 'friendly_path', 'get_directory_index',
+              'locate_files'],
+    'valid': ['check_valid_id_or_pattern', 'is_valid_id'],
+    'warmup': ['Warmup', 'collect_code_names'],
+    'watch': ['ConfigWatcher'],
+}
 
+# Other names that used to be reachable from conf_tools, because of the
+# star imports: name -> (module, attribute or None for the module).
+_other_names = {
+    'contract': ('conf_tools.utils.production', 'contract'),
+    'new_contract': ('contracts', 'new_contract'),
+    'describe_type': ('contracts', 'describe_type'),
+    'describe_value': ('contracts', 'describe_value'),
+    'yaml': ('yaml', None),
+    'YAMLError': ('yaml', 'YAMLError'),
+    'os': ('os', None),
+    'pformat': ('pprint', 'pformat'),
+}
 
-class ConfToolsGlobal(object):
-    log_instance_error = True
+if sys.version_info[0] < 3:
+    # It needs the async syntax of Python 3.
+    del _lazy_names['aio']
+
+# name -> submodule
+_name2module = dict((name, module)
+                    for module, names in _lazy_names.items()
+                    for name in names)
+
+__all__ = sorted(['ID_FIELD', 'ConfToolsGlobal', 'logger'] +
+                 list(_name2module))
+
+
+def __getattr__(name):
+    if name in _name2module:
+        module = importlib.import_module('.' + _name2module[name], __name__)
+        value = getattr(module, name)
+    elif name in _lazy_names:
+        value = importlib.import_module('.' + name, __name__)
+    elif name in _other_names:
+        module_name, attribute = _other_names[name]
+        value = importlib.import_module(module_name)
+        if attribute is not None:
+            value = getattr(value, attribute)
+    else:
+        msg = 'module %r has no attribute %r' % (__name__, name)
+        raise AttributeError(msg)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_name2module) | set(_lazy_names) |
+                  set(_other_names))
 
 
-from .exceptions import *
-from .patterns import *
-from .valid import *
-
-from .exceptions import *
-from .special_subst import *
-from .load_entries import *
-from .checks import *
-from .instantiate_utils import *
-from .code_specs import *
-from .code_desc import *
-from .objspec import *
-from .master import *
-from .global_config import *
+if sys.version_info < (3, 7):
+    for _name in sorted(set(_lazy_names) | set(_name2module) |
+                        set(_other_names)):
+        __getattr__(_name)
+    del _name
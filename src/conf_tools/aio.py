@@ -0,0 +1,92 @@
+import asyncio
+
+__all__ = [
+    'AsyncSpecMixin',
+    'AsyncMasterMixin',
+]
+
+
+class AsyncSpecMixin(object):
+    """
+        Awaitable versions of the methods of ObjectSpec that might block:
+        reading the files and parsing them, and calling the constructors
+        are done in the executor, not in the event loop.
+
+        The reads of the same ObjectSpec are done one at a time, and
+        concurrent calls to ainstance() for the same ID share the same
+        construction.
+        The ObjectSpec should not be used synchronously by other threads
+        while these are pending.
+    """
+
+    # Executor used by the awaitable methods (None: the loop's default).
+    async_executor = None
+
+    def _aio_state(self):
+        """ Returns (loop, lock, id -> future of the constructions). """
+        loop = asyncio.get_event_loop()
+        state = getattr(self, '_aio', None)
+        if state is None or state[0] is not loop:
+            state = self._aio = (loop, asyncio.Lock(), {})
+        return state
+
+    def __getstate__(self):
+        # The asyncio objects cannot be pickled
+        state = dict(self.__dict__)
+        state.pop('_aio', None)
+        return state
+
+    async def _run(self, f, *args):
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self.async_executor, f, *args)
+
+    async def amake_sure_everything_read(self):
+        """ Awaitable version of make_sure_everything_read(). """
+        _, lock, _ = self._aio_state()
+        async with lock:
+            if self.dirs_to_read:
+                await self._run(self.make_sure_everything_read)
+
+    async def amake_sure_read(self, key):
+        """ Reads what is needed to look up the given key. """
+        _, lock, _ = self._aio_state()
+        async with lock:
+            if self.dirs_to_read:
+                await self._run(self._make_sure_read, key)
+
+    async def aget(self, key):
+        """ Awaitable version of __getitem__. """
+        await self.amake_sure_read(key)
+        return self[key]
+
+    async def ainstance(self, id_object):
+        """ Awaitable version of instance(). """
+        if not isinstance(id_object, str):
+            raise ValueError('Expected string; got %r' % id_object)
+        loop, _, inflight = self._aio_state()
+        future = inflight.get(id_object, None)
+        if future is None:
+            future = asyncio.ensure_future(self._ainstance(id_object),
+                                           loop=loop)
+            inflight[id_object] = future
+            future.add_done_callback(lambda _: inflight.pop(id_object, None))
+        # If one of the callers is cancelled, the others still wait.
+        return await asyncio.shield(future)
+
+    async def _ainstance(self, id_object):
+        await self.amake_sure_read(id_object)
+        spec = self[id_object]
+        return await self._run(self._instance_cached, id_object, spec)
+
+
+class AsyncMasterMixin(object):
+    """ Awaitable versions of the methods of ConfigMaster. """
+
+    async def aload(self, directory=None):
+        """
+            Same as load(), but also reads all the files (in the
+            executor of each spec).
+        """
+        self.load(directory)
+        await asyncio.gather(*[spec.amake_sure_everything_read()
+                               for spec in self.specs.values()])
@@ -0,0 +1,113 @@
+import os
+import pickle
+
+from . import logger
+from .utils import friendly_path, get_directory_index
+
+__all__ = [
+    'compile_bundle',
+    'load_bundle',
+]
+
+# Bump when the format of the bundles changes.
+BUNDLE_FORMAT = 1
+
+# The ObjectSpec attributes saved in the bundle.
+SPEC_STATE = ['templates', 'entry2file', 'file2entries', 'file_stamps',
+              '_derived_from', 'files_read', 'dirs_read', 'roots_read']
+
+
+def compile_bundle(master, filename):
+    """
+        Reads all the configuration of the ConfigMaster and writes
+        it to a single file, that can be restored with load_bundle()
+        without parsing anything.
+    """
+    specs = {}
+    for name, spec in master.specs.items():
+        spec.make_sure_everything_read()
+        state = dict((k, getattr(spec, k)) for k in SPEC_STATE)
+        state['pattern'] = spec.pattern
+        state['entries'] = dict(spec.items())
+        state['listings'] = dict(
+            (root, get_directory_index().locate_files(root, spec.pattern))
+            for root in spec.roots_read)
+        specs[name] = state
+
+    bundle = dict(format=BUNDLE_FORMAT, name=master.name,
+                  dirs=list(master._dirs), specs=specs)
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.exists(dirname):
+        os.makedirs(dirname)
+    tmp = '%s.tmp%s' % (filename, os.getpid())
+    with open(tmp, 'wb') as f:
+        pickle.dump(bundle, f, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp, filename)
+    logger.debug('Wrote bundle %s' % friendly_path(filename))
+
+
+def load_bundle(master, filename):
+    """
+        Restores the configuration saved by compile_bundle().
+
+        The bundle is used only if it was compiled for the same
+        directories and specs, and none of the source files changed
+        (or were added or deleted). Returns True if the bundle was
+        used, False otherwise (and then nothing is changed).
+    """
+    bundle = read_bundle(filename)
+    if bundle is None:
+        return False
+    reason = why_not_valid(master, bundle)
+    if reason is not None:
+        logger.debug('Not using bundle %s: %s' %
+                     (friendly_path(filename), reason))
+        return False
+
+    for name, spec in master.specs.items():
+        state = bundle['specs'][name]
+        dict.clear(spec)
+        dict.update(spec, state['entries'])
+        for k in SPEC_STATE:
+            setattr(spec, k, state[k])
+        spec.dirs_to_read = []
+        spec._rebuild_dispatcher()
+    master.loaded = True
+    return True
+
+
+def read_bundle(filename):
+    """ Returns the bundle in the file, or None if not readable. """
+    try:
+        with open(filename, 'rb') as f:
+            bundle = pickle.load(f)
+    except (IOError, OSError):
+        return None
+    except Exception as e:
+        logger.warning('Ignoring corrupted bundle %r: %s' % (filename, e))
+        return None
+    if not isinstance(bundle, dict) or bundle.get('format') != BUNDLE_FORMAT:
+        return None
+    return bundle
+
+
+def why_not_valid(master, bundle):
+    """ Returns a string if the bundle cannot be used, else None. """
+    if bundle['dirs'] != master._dirs:
+        return 'compiled for dirs %s' % bundle['dirs']
+    if set(bundle['specs']) != set(master.specs):
+        return 'compiled for specs %s' % sorted(bundle['specs'])
+
+    index = get_directory_index()
+    for name, spec in master.specs.items():
+        state = bundle['specs'][name]
+        if state['pattern'] != spec.pattern:
+            return 'different pattern for %s' % name
+        for root, filenames in state['listings'].items():
+            index.invalidate(root)
+            if index.locate_files(root, spec.pattern) != filenames:
+                return 'files added or deleted in %s' % friendly_path(root)
+        for f, stamp in state['file_stamps'].items():
+            if spec._file_stamp(f) != stamp:
+                return 'file %s changed' % friendly_path(f)
+    return None
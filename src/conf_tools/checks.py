@@ -1,6 +1,7 @@
 from pprint import pformat
 
-from contracts import contract, describe_type
+from contracts import describe_type
+from .utils.production import contract
 
 from .exceptions import BadConfig
 
@@ -1,6 +1,7 @@
 import traceback
 
-from contracts import contract, new_contract
+from contracts import new_contract
+from .utils.production import contract
 
 from .exceptions import BadConfig, ConfToolsException
 from .instantiate_utils import instantiate
@@ -41,6 +42,7 @@ def check_valid_code_spec_contract(x):
         raise ValueError(e)
 
 new_contract('code_spec', check_valid_code_spec_contract)
+new_contract("id_or_spec", "dict|str")
 
 @contract(code_spec='code_spec')
 def instantiate_spec(code_spec):
@@ -55,16 +57,22 @@ def instantiate_spec(code_spec):
 
         return instantiate(function_name, parameters)
     except Exception as e:
-        msg = 'Could not instance the spec:\n' 
-        msg += indent(format_code_spec(code_spec).strip(), '  ').strip()
-        msg += '\nbecause of this error:\n'
-        if isinstance(e, ConfToolsException):
-            st = str(e)
-        else:
-            st = traceback.format_exc()
-        msg += indent(st.strip(), '| ')
-        msg = msg.strip()
-        raise ConfToolsException(msg)
+        raise instantiate_spec_error(code_spec, e)
+
+
+def instantiate_spec_error(code_spec, e):
+    ''' Returns the exception to raise when the spec could not be
+        instanced because of the exception e being handled. '''
+    msg = 'Could not instance the spec:\n' 
+    msg += indent(format_code_spec(code_spec).strip(), '  ').strip()
+    msg += '\nbecause of this error:\n'
+    if isinstance(e, ConfToolsException):
+        st = str(e)
+    else:
+        st = traceback.format_exc()
+    msg += indent(st.strip(), '| ')
+    msg = msg.strip()
+    return ConfToolsException(msg)
 
 def format_code_spec(code_spec):
     return format_yaml(code_spec)
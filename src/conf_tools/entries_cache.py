@@ -0,0 +1,306 @@
+import hashlib
+import os
+import pickle
+
+from . import logger
+from .utils import friendly_path, get_directory_index
+
+__all__ = [
+    'EntriesCache',
+    'get_entries_cache',
+    'get_id_index',
+    'IdIndex',
+    'set_entries_cache_dir',
+]
+
+# Environment variable used to enable the cache at startup.
+CACHE_DIR_ENV = 'CONF_TOOLS_CACHE_DIR'
+
+# Bump when the format of the records changes.
+CACHE_FORMAT = 2
+
+
+def file_digest(data):
+    """ Returns the content hash used to fingerprint files. """
+    return hashlib.sha1(data).hexdigest()
+
+
+def file_fingerprint(filename, data=None):
+    """
+        Returns the tuple (size, mtime, digest) for the file.
+        If data is None, the file is read.
+    """
+    st = os.stat(filename)
+    if data is None:
+        with open(filename, 'rb') as f:
+            data = f.read()
+    return st.st_size, st.st_mtime, file_digest(data)
+
+
+def file_stamp(filename, use_hash=False):
+    """
+        Returns a value that changes when the file is modified:
+        (size, mtime), or (size, digest) if use_hash is True.
+        Returns None if the file does not exist.
+    """
+    try:
+        if use_hash:
+            size, _, digest = file_fingerprint(filename)
+            return size, digest
+        st = os.stat(filename)
+        return st.st_size, st.st_mtime
+    except (IOError, OSError):
+        return None
+
+
+class PickleStore(object):
+    """ A directory of pickled records, written atomically. """
+
+    def __init__(self, dirname):
+        self.dirname = dirname
+
+    def _read_record(self, record_filename):
+        try:
+            with open(record_filename, 'rb') as f:
+                record = pickle.load(f)
+        except (IOError, OSError):
+            return None
+        except Exception as e:
+            logger.warning('Ignoring corrupted cache record %r: %s' %
+                           (record_filename, e))
+            return None
+        if not isinstance(record, dict) or \
+                record.get('format') != CACHE_FORMAT:
+            return None
+        return record
+
+    def _write_record(self, record_filename, record):
+        if not os.path.exists(self.dirname):
+            os.makedirs(self.dirname)
+        tmp = '%s.tmp%s' % (record_filename, os.getpid())
+        try:
+            with open(tmp, 'wb') as f:
+                pickle.dump(record, f, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp, record_filename)
+        except (IOError, OSError, pickle.PicklingError) as e:
+            logger.warning('Cannot write cache record %r: %s' %
+                           (friendly_path(record_filename), e))
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+
+    def _list_records(self):
+        if not os.path.exists(self.dirname):
+            return []
+        return [os.path.join(self.dirname, x)
+                for x in sorted(os.listdir(self.dirname))
+                if x.endswith('.pickle')]
+
+    def invalidate_all(self):
+        """ Removes all the records. """
+        for r in self._list_records():
+            os.unlink(r)
+
+
+class EntriesCache(PickleStore):
+    """
+        Persistent cache of the entries of each configuration file,
+        as parsed (before check_entries(), whose result depends on
+        the environment variables and on the file system).
+
+        Every file is stored as a pickled record in the cache directory;
+        a record is valid only if path, size, mtime and content hash
+        of the file are the same as when it was stored.
+
+        The IdIndex is stored in the "index" subdirectory.
+    """
+
+    def __init__(self, dirname):
+        PickleStore.__init__(self, dirname)
+        self.hits = 0
+        self.misses = 0
+        self.id_index = IdIndex(os.path.join(dirname, 'index'))
+
+    def __repr__(self):
+        return 'EntriesCache(%s)' % friendly_path(self.dirname)
+
+    def _record_filename(self, filename):
+        key = hashlib.sha1(os.path.abspath(filename).encode('utf-8'))
+        return os.path.join(self.dirname, key.hexdigest() + '.pickle')
+
+    def load(self, filename, parse):
+        """
+            Returns the list of entries for the file, using the
+            cached record if it is still valid; otherwise it calls
+            parse(filename, data) and stores the result.
+        """
+        with open(filename, 'rb') as f:
+            data = f.read()
+        entries = self.lookup(filename, data)
+        if entries is None:
+            entries = list(parse(filename, data))
+            self.store(filename, data, entries)
+        return entries
+
+    def lookup(self, filename, data):
+        """
+            Returns the cached entries for the file with the given
+            contents, or None if there is no valid record.
+        """
+        size, mtime, digest = file_fingerprint(filename, data)
+        record = self._read_record(self._record_filename(filename))
+        if (record is not None
+                and record['filename'] == filename
+                and record['size'] == size
+                and record['mtime'] == mtime
+                and record['digest'] == digest):
+            self.hits += 1
+            return record['entries']
+        self.misses += 1
+        return None
+
+    def store(self, filename, data, entries):
+        """ Stores the entries parsed from the given contents of the file. """
+        size, mtime, digest = file_fingerprint(filename, data)
+        record = dict(format=CACHE_FORMAT, filename=filename, size=size,
+                      mtime=mtime, digest=digest, entries=entries)
+        self._write_record(self._record_filename(filename), record)
+
+    def invalidate(self, filename=None):
+        """
+            Removes the record for the given file, or all the records
+            if filename is None.
+        """
+        if filename is not None:
+            r = self._record_filename(filename)
+            if os.path.exists(r):
+                os.unlink(r)
+        else:
+            self.invalidate_all()
+            self.id_index.invalidate_all()
+
+    def prune(self):
+        """
+            Removes the records that are no longer valid, because
+            the source file changed or was deleted.
+            Returns the number of records removed.
+        """
+        nremoved = 0
+        for r in self._list_records():
+            record = self._read_record(r)
+            if record is None or not self._still_valid(record):
+                os.unlink(r)
+                nremoved += 1
+        return nremoved
+
+    def _still_valid(self, record):
+        filename = record['filename']
+        if not os.path.exists(filename):
+            return False
+        st = os.stat(filename)
+        return st.st_size == record['size'] and st.st_mtime == record['mtime']
+
+
+class IdIndex(PickleStore):
+    """
+        Persistent index that says, for each directory and pattern,
+        which files define each entry and which files define templates.
+
+        It allows to read only the files needed for looking up one
+        entry (see ObjectSpec). A record is valid only if the directory
+        contains the same files, with the same stamps, as when it was
+        stored.
+    """
+
+    def __init__(self, dirname):
+        PickleStore.__init__(self, dirname)
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return 'IdIndex(%s)' % friendly_path(self.dirname)
+
+    def _record_filename(self, root, pattern):
+        key = '%s\0%r' % (os.path.realpath(root), pattern)
+        key = hashlib.sha1(key.encode('utf-8'))
+        return os.path.join(self.dirname, key.hexdigest() + '.pickle')
+
+    def lookup(self, root, pattern, stamp):
+        """
+            Returns the record for the directory, or None if there is
+            no valid record. The function stamp(filename) is used to
+            check that the files did not change.
+
+            The record is a dict with fields:
+            - filenames: the sorted list of files;
+            - name2files: entry name -> list of files defining it;
+            - template_files: list of files that define templates.
+        """
+        record = self._read_record(self._record_filename(root, pattern))
+        if record is not None and self._still_valid(record, stamp):
+            self.hits += 1
+            return record
+        self.misses += 1
+        return None
+
+    def _still_valid(self, record, stamp):
+        filenames = get_directory_index().locate_files(record['root'],
+                                                       record['pattern'])
+        if filenames != record['filenames']:
+            return False
+        stamps = record['stamps']
+        return all(stamp(f) == stamps[f] for f in filenames)
+
+    def store(self, root, pattern, stamps, file2entries, is_template):
+        """
+            Stores the record for the files in the directory.
+
+            :param stamps: filename -> stamp, for all the files.
+            :param file2entries: filename -> list of entry names.
+            :param is_template: function that says if a name is a template.
+        """
+        filenames = sorted(stamps)
+        name2files = {}
+        template_files = []
+        for f in filenames:
+            names = file2entries.get(f, [])
+            for name in names:
+                name2files.setdefault(name, []).append(f)
+            if any(is_template(name) for name in names):
+                template_files.append(f)
+        record = dict(format=CACHE_FORMAT, root=os.path.realpath(root),
+                      pattern=pattern, filenames=filenames, stamps=stamps,
+                      name2files=name2files, template_files=template_files)
+        self._write_record(self._record_filename(root, pattern), record)
+
+
+class EntriesCacheGlobal(object):
+    # The current instance; None if caching is disabled.
+    cache = None
+
+
+def set_entries_cache_dir(dirname):
+    """
+        Sets the directory for the persistent cache of parsed entries.
+        Use None to disable caching.
+    """
+    if dirname is None:
+        EntriesCacheGlobal.cache = None
+    else:
+        EntriesCacheGlobal.cache = EntriesCache(dirname)
+
+
+def get_entries_cache():
+    """ Returns the current EntriesCache, or None if disabled. """
+    return EntriesCacheGlobal.cache
+
+
+def get_id_index():
+    """ Returns the IdIndex of the current cache, or None if disabled. """
+    cache = EntriesCacheGlobal.cache
+    if cache is None:
+        return None
+    return cache.id_index
+
+
+if os.environ.get(CACHE_DIR_ENV, ''):
+    set_entries_cache_dir(os.path.expanduser(os.environ[CACHE_DIR_ENV]))
@@ -1,3 +1,6 @@
+import heapq
+import traceback
+
 
 __all__ = [
     'BadConfig', 
@@ -6,6 +9,7 @@ __all__ = [
     'SemanticMistake', 
     'ResourceNotFound', 
     'SemanticMistakeKeyNotFound',
+    'InstanceManyError',
 ]
 
 class BadConfig(Exception):
@@ -43,25 +47,77 @@ class SemanticMistake(ConfToolsException):
 
 
 class SemanticMistakeKeyNotFound(SemanticMistake):
-    """ A spec has not been found. """
-    def __init__(self, name, object_spec):
-        # TODO: abbreviate
-        # TODO: sort by similarity
+    """ 
+        A spec has not been found. 
+
+        The message, which lists the known entries, is built only
+        when it is needed, from a snapshot of the ObjectSpec taken 
+        at that time (or when the exception is pickled).
+    """
+
+    # Maximum number of entries listed in the message
+    max_entries_shown = 50
+
+    def __init__(self, name, object_spec=None, snapshot=None):
+        """ 
+            Either object_spec or snapshot (as returned by 
+            take_snapshot()) must be given.
+        """
+        SemanticMistake.__init__(self, name)
+        self.name = name
+        self.object_spec = object_spec
+        self.snapshot = snapshot
+        self._msg = None
+
+    def get_snapshot(self):
+        if self.snapshot is None:
+            take_snapshot = SemanticMistakeKeyNotFound.take_snapshot
+            self.snapshot = take_snapshot(self.object_spec)
+            self.object_spec = None
+        return self.snapshot
+
+    @staticmethod
+    def take_snapshot(object_spec):
         from . import ObjectSpec
         assert isinstance(object_spec, ObjectSpec)
-        things = object_spec.name
-        msg = ('The name %r does not match any %s. ' % (name, things))
+        n = SemanticMistakeKeyNotFound.max_entries_shown
+        # Only the first n, to avoid sorting all of them
+        shown = tuple(heapq.nsmallest(n, dict.keys(object_spec)))
+        return dict(things=object_spec.name,
+                    nfound=dict.__len__(object_spec),
+                    shown=shown,
+                    templates=tuple(object_spec.templates),
+                    directories=object_spec._directories_snapshot())
+
+    def __str__(self):
+        if self._msg is None:
+            self._msg = self._format_message()
+        return self._msg
+
+    def __reduce__(self):
+        return (SemanticMistakeKeyNotFound,
+                (self.name, None, self.get_snapshot()))
+
+    def _format_message(self):
+        # TODO: sort by similarity
+        from .objspec import format_list_of_directories
+        snapshot = self.get_snapshot()
+        msg = ('The name %r does not match any %s. ' % 
+               (self.name, snapshot['things']))
         msg += '\nI know '
-        found = dict.keys(object_spec)
-        if found:
-            found = sorted(list(found))
-            msg += '%d entries (%s)' % (len(found), ", ".join(found))
+        nfound = snapshot['nfound']
+        if nfound:
+            shown = ", ".join(snapshot['shown'])
+            others = nfound - len(snapshot['shown'])
+            if others > 0:
+                shown += ', ... and %d others' % others
+            msg += '%d entries (%s)' % (nfound, shown)
         else:
             msg += '0 entries'
         msg += '\n'
-        patterns = object_spec.templates.keys()
+        patterns = snapshot['templates']
         if patterns:
-            if found:
+            if nfound:
                 msg += ' and the'
             else:
                 msg += ' the'
@@ -69,12 +125,39 @@ class SemanticMistakeKeyNotFound(SemanticMistake):
         else:
             msg += ' and 0 templates.'
         
-        msg += object_spec._formatted_list_of_directories()
-        # TODO: sort by similarity
-        # TODO: add "... and X others"
-        SemanticMistake.__init__(self, msg)  # XXX: sure?
+        msg += format_list_of_directories(snapshot['directories'])
+        return msg
+
+
+class InstanceManyError(ConfToolsException):
+    """ 
+        Raised by ObjectSpec.instance_many() if some of the objects
+        could not be instanced. 
+
+        :ivar errors: OrderedDict ID -> exception, as raised by instance().
+        :ivar results: dict ID -> object, for the other IDs.
+    """
+
+    def __init__(self, errors, results):
+        msg = 'Could not instance %d of %d objects (%s):\n' % (
+            len(errors), len(errors) + len(results), ', '.join(errors))
+        msg += '\n'.join(str(e) for e in errors.values())
+        ConfToolsException.__init__(self, msg)
+        self.errors = errors
+        self.results = results
+
+    def __reduce__(self):
+        return InstanceManyError, (self.errors, self.results)
 
 
 class ResourceNotFound(SemanticMistake):
     """ For example,  missing files/directories. """
     pass
+
+
+def describe_error(e):
+    """ Describes the exception being handled, as instance() does. """
+    if isinstance(e, ConfToolsException):
+        return str(e)
+    else:
+        return traceback.format_exc()
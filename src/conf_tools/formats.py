@@ -0,0 +1,192 @@
+import io
+import json
+import os
+
+import six
+import yaml
+from yaml import YAMLError
+
+from conf_tools import ConfToolsGlobal, logger
+from .exceptions import SyntaxMistake
+from .utils import friendly_path, register_frozen_representers
+
+try:
+    from yaml import CSafeLoader
+except ImportError:  # PyYAML compiled without libyaml
+    CSafeLoader = None
+
+# The loader used by yaml.load() when not given one, which is the one
+# always used before libyaml was: FullLoader in PyYAML >= 5.1.
+PythonLoader = getattr(yaml, 'FullLoader', yaml.Loader)
+
+__all__ = [
+    'register_format',
+    'get_format_loader',
+    'format_patterns',
+]
+
+register_frozen_representers()
+
+
+class FormatsGlobal(object):
+    # extension -> function (filename, data) -> parsed contents
+    loaders = {}
+    # Format used for the extensions not registered
+    default_extension = '.yaml'
+    # extensions whose loaders can read the open file (register_format())
+    streaming = set()
+    # True once we logged that libyaml is not available
+    logged_no_libyaml = False
+
+
+def register_format(extension, loader, streaming=False):
+    """
+        Registers the loader for the files with the given extension
+        (e.g. ".json").
+
+        The loader is called as loader(filename, data), where data are
+        the contents of the file as bytes. It must return either a list
+        of dicts, None for an empty file, or an iterator over the dicts
+        (for formats that can be parsed incrementally). It must raise
+        SyntaxMistake if the file cannot be parsed.
+
+        If streaming is True, data might also be the file, open in 
+        binary mode, which the loader can read while iterating.
+    """
+    if not extension.startswith('.'):
+        msg = 'Expected an extension starting with ".", got %r.' % extension
+        raise ValueError(msg)
+    FormatsGlobal.loaders[extension] = loader
+    if streaming:
+        FormatsGlobal.streaming.add(extension)
+    else:
+        FormatsGlobal.streaming.discard(extension)
+
+
+def get_format_loader(filename):
+    """
+        Returns the loader for the file, based on its extension.
+        Files with unknown extensions are parsed as YAML.
+    """
+    extension = os.path.splitext(filename)[1]
+    loaders = FormatsGlobal.loaders
+    if extension in loaders:
+        return loaders[extension]
+    return loaders[FormatsGlobal.default_extension]
+
+
+def is_streaming_format(filename):
+    """ True if the loader for the file can be given the open file. """
+    extension = os.path.splitext(filename)[1]
+    if not extension in FormatsGlobal.loaders:
+        extension = FormatsGlobal.default_extension
+    return extension in FormatsGlobal.streaming
+
+
+def known_format(pattern):
+    """ Returns True if the pattern ends with a registered extension. """
+    return any(pattern.endswith(extension)
+               for extension in FormatsGlobal.loaders)
+
+
+def format_patterns(pattern):
+    """
+        Returns a list of patterns that match the given one with
+        any of the known extensions, for use in ConfigMaster.add_class().
+
+            format_patterns('*.robots')
+            # ['*.robots.json', '*.robots.jsonl', '*.robots.yaml', ...]
+    """
+    return [pattern + extension for extension in sorted(FormatsGlobal.loaders)]
+
+
+def yaml_load(data):
+    """
+        Parses a YAML document, using the libyaml loader if available
+        (and ConfToolsGlobal.use_libyaml is True).
+
+        In case of errors the document is parsed again with the pure-Python
+        loader (PythonLoader), so that the error messages and the tags 
+        accepted are always the same.
+    """
+    if not ConfToolsGlobal.use_libyaml:
+        return yaml.load(data, Loader=PythonLoader)
+    if CSafeLoader is None:
+        if not FormatsGlobal.logged_no_libyaml:
+            FormatsGlobal.logged_no_libyaml = True
+            logger.info('PyYAML was built without libyaml; using the '
+                        'pure-Python loader %s.' % PythonLoader.__name__)
+        return yaml.load(data, Loader=PythonLoader)
+    try:
+        return yaml.load(data, Loader=CSafeLoader)
+    except YAMLError:
+        return yaml.load(data, Loader=PythonLoader)
+
+
+def load_yaml(filename, data):
+    try:
+        return yaml_load(data)
+    except YAMLError as e:
+        msg = 'Cannot parse YAML file %s:\n%s' % (friendly_path(filename), e)
+        raise SyntaxMistake(msg)  # TODO: make UserError
+
+
+def native_strings(x):
+    """
+        On Python 2, converts the ASCII unicode strings returned by the
+        json module to str, as the YAML loader does (the ids and the
+        keys must be str).
+    """
+    if isinstance(x, dict):
+        return dict((native_strings(k), native_strings(v))
+                    for k, v in x.items())
+    if isinstance(x, list):
+        return [native_strings(v) for v in x]
+    if isinstance(x, six.text_type):
+        try:
+            return x.encode('ascii')
+        except UnicodeEncodeError:
+            return x
+    return x
+
+
+def json_loads(s):
+    x = json.loads(s)
+    if six.PY2:
+        x = native_strings(x)
+    return x
+
+
+def load_json(filename, data):
+    if not data.strip():
+        return None
+    try:
+        return json_loads(data.decode('utf-8'))
+    except ValueError as e:  # also UnicodeDecodeError
+        msg = 'Cannot parse JSON file %s:\n%s' % (friendly_path(filename), e)
+        raise SyntaxMistake(msg)
+
+
+def load_json_lines(filename, data):
+    """ 
+        One dict per line; the lines are read and parsed one at a time.
+        Blank lines are skipped.
+    """
+    f = io.BytesIO(data) if isinstance(data, bytes) else data
+    # not "for line in f": Python 2 files read ahead
+    for num_line, line in enumerate(iter(f.readline, b'')):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json_loads(line.decode('utf-8'))
+        except ValueError as e:  # also UnicodeDecodeError
+            msg = ('Cannot parse line %d of JSON lines file %s:\n%s' %
+                   (num_line + 1, friendly_path(filename), e))
+            raise SyntaxMistake(msg)
+
+
+register_format('.yaml', load_yaml)
+register_format('.yml', load_yaml)
+register_format('.json', load_json)
+register_format('.jsonl', load_json_lines, streaming=True)
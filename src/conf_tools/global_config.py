@@ -1,6 +1,8 @@
 from . import logger
-from .utils import dir_from_package_name, expand_environment
-from contracts import check_isinstance, contract
+from .utils import (dir_from_package_name, expand_environment,
+    get_directory_index)
+from contracts import check_isinstance
+from .utils.production import contract
 import os
 
 __all__ = [ 
@@ -109,11 +111,13 @@ class GlobalConfig(object):
         GlobalConfig._masters = {}
         GlobalConfig._singletons = {}
         GlobalConfig._dirs = []
+        get_directory_index().invalidate()
 
 
 def reset_config():
     # Reset all the config
     setattr(GlobalConfig, '_dirs', [])
+    get_directory_index().invalidate()
     for _, m in GlobalConfig._masters.items():
         from conf_tools.master import ConfigMaster
         check_isinstance(m, ConfigMaster)
@@ -125,10 +129,16 @@ def reset_config():
             spec.files_read = set()
             spec.dirs_read = []
             spec.dirs_to_read = []
+            spec.roots_read = []
             
             # ID -> file where it was found
             spec.entry2file = {}
+            spec.file2entries = {}
+            spec.file_stamps = {}
+            spec._derived_from = {}
+            spec._index_records = {}
             spec.templates = {}
+            spec._rebuild_dispatcher()
 
         # all the dirs that were passed to load(), in case we miss any
         setattr(m, '_dirs', [])
@@ -0,0 +1,204 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+import hashlib
+import json
+import threading
+import time
+import weakref
+
+__all__ = [
+    'InstanceCache',
+    'spec_fingerprint',
+]
+
+
+def spec_fingerprint(spec):
+    """ Returns a string that changes when the spec changes. """
+    try:
+        s = json.dumps(spec, sort_keys=True, default=repr)
+    except (TypeError, ValueError):
+        # e.g. keys of different types
+        s = repr(spec)
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+
+class InstanceCache(object):
+    """
+        Cache of the objects created by ObjectSpec.instance(), keyed
+        by the ID and the fingerprint of the spec, so that a changed
+        spec is never served the old object.
+
+        The policies are:
+
+        - 'lru': keeps (strong references to) the last max_size objects;
+        - 'weak': keeps the objects as long as somebody else uses them
+          (objects that do not support weak references are not cached);
+        - 'ttl': like 'lru', but the objects expire after ttl seconds.
+
+        The first access to a key is done while holding a lock for that
+        key, so that concurrent requests for the same object create it
+        only once.
+
+        Usage: ..
+
+            master.specs['planners'].enable_instance_cache('lru', 10)
+    """
+
+    policies = ['lru', 'weak', 'ttl']
+
+    def __init__(self, policy='lru', max_size=100, ttl=None):
+        """
+            :param policy: One of 'lru', 'weak', 'ttl'.
+            :param max_size: Maximum number of objects kept ('lru', 'ttl').
+            :param ttl: Seconds after which the objects expire ('ttl').
+        """
+        if not policy in InstanceCache.policies:
+            msg = ('Invalid policy %r; expected one of %s.' %
+                   (policy, InstanceCache.policies))
+            raise ValueError(msg)
+        if policy == 'ttl' and ttl is None:
+            raise ValueError('The "ttl" policy needs the ttl parameter.')
+        self.policy = policy
+        self.max_size = max_size
+        self.ttl = ttl
+        # key -> (fingerprint, value or weakref, expiration time or None)
+        self._values = OrderedDict()
+        # reentrant, as the weakref callbacks might run while it is held
+        self._lock = threading.RLock()
+        # key -> [lock, number of users]
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __getstate__(self):
+        # The objects and the locks are not pickled
+        state = dict(self.__dict__)
+        state['_values'] = OrderedDict()
+        del state['_lock']
+        state['_key_locks'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return ('InstanceCache(%s;size:%d;hits:%d;misses:%d)' %
+                (self.policy, len(self._values), self.hits, self.misses))
+
+    def __len__(self):
+        return len(self._values)
+
+    def stats(self):
+        """ Returns a dict with the statistics. """
+        with self._lock:
+            return dict(policy=self.policy, size=len(self._values),
+                        hits=self.hits, misses=self.misses,
+                        evictions=self.evictions)
+
+    def get(self, key, fingerprint, create):
+        """
+            Returns the object cached for (key, fingerprint); if not
+            present, it calls create() and caches its result.
+        """
+        found, value = self._lookup(key, fingerprint)
+        if found:
+            return value
+        with self._locked(key):
+            # It might have been created while we were waiting
+            found, value = self._lookup(key, fingerprint, count_miss=True)
+            if found:
+                return value
+            value = create()
+            self._store(key, fingerprint, value)
+            return value
+
+    def peek(self, key, fingerprint):
+        """ Returns a tuple (found, object), without creating it. """
+        return self._lookup(key, fingerprint, count_miss=True)
+
+    def put(self, key, fingerprint, value):
+        """ Caches the object created elsewhere. """
+        self._store(key, fingerprint, value)
+
+    def invalidate(self, key):
+        """ Forgets the object for the given key. """
+        with self._lock:
+            self._values.pop(key, None)
+
+    def clear(self):
+        """ Forgets all objects. """
+        with self._lock:
+            self._values.clear()
+
+    def _lookup(self, key, fingerprint, count_miss=False):
+        """ Returns a tuple (found, value). """
+        with self._lock:
+            record = self._values.get(key, None)
+            if record is not None:
+                fp, value, expires = record
+                if self.policy == 'weak':
+                    value = value()
+                ok = (fp == fingerprint and
+                      not (self.policy == 'weak' and value is None) and
+                      not (expires is not None and time.time() > expires))
+                if ok:
+                    self.hits += 1
+                    if self.policy != 'weak':
+                        self._values[key] = self._values.pop(key)
+                    return True, value
+                del self._values[key]
+                self.evictions += 1
+            if count_miss:
+                self.misses += 1
+            return False, None
+
+    def _store(self, key, fingerprint, value):
+        expires = None
+        if self.policy == 'weak':
+            try:
+                value = weakref.ref(value, self._make_remover(key))
+            except TypeError:
+                # not all objects support weak references
+                return
+        elif self.policy == 'ttl':
+            expires = time.time() + self.ttl
+
+        with self._lock:
+            self._values[key] = (fingerprint, value, expires)
+            if self.policy != 'weak' and self.max_size is not None:
+                while len(self._values) > self.max_size:
+                    self._values.popitem(last=False)
+                    self.evictions += 1
+
+    def _make_remover(self, key):
+        selfref = weakref.ref(self)
+
+        def remove(ref):
+            cache = selfref()
+            if cache is None:
+                return
+            with cache._lock:
+                record = cache._values.get(key, None)
+                if record is not None and record[1] is ref:
+                    del cache._values[key]
+                    cache.evictions += 1
+        return remove
+
+    @contextmanager
+    def _locked(self, key):
+        """ Holds the lock for the given key. """
+        with self._lock:
+            entry = self._key_locks.get(key, None)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._key_locks[key]
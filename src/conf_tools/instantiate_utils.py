@@ -1,12 +1,19 @@
+import importlib
 import sys
 import traceback
 import six
-from contracts import contract
+from .utils.production import contract
 from contracts.utils import raise_desc
 
 from .exceptions import SemanticMistake
 from .utils import indent
 
+try:
+    import importlib.util
+    HAS_FIND_SPEC = True
+except ImportError:  # Python 2
+    HAS_FIND_SPEC = False
+
 __all__ = ['import_name', 'instantiate']
 
 
@@ -29,6 +36,11 @@ def instantiate(function_name, parameters):
         raise SemanticMistake(msg)
 
 
+class ImportNameGlobal(object):
+    # dotted name -> object, for the names resolved by import_name()
+    resolved = {}
+
+
 @contract(name='str')
 def import_name(name):
     '''
@@ -36,6 +48,67 @@ def import_name(name):
 
         Note that "name" might be "module.module.name" as well.
     '''
+    resolved = ImportNameGlobal.resolved
+    if name in resolved:
+        return resolved[name]
+    # Without find_spec() we cannot look for the modules without
+    # importing them; we use the __import__()-based path instead.
+    f = resolve_name(name) if HAS_FIND_SPEC else None
+    if f is None:
+        # Not found: this gives the appropriate error
+        f = import_name_slow(name)
+    resolved[name] = f
+    return f
+
+
+def resolve_name(name):
+    '''
+        Finds the object with the given name, importing the modules
+        and looking up the attributes from the left. Returns None if
+        not found (without explaining why; see import_name_slow()).
+    '''
+    tokens = name.split('.')
+    module_name = tokens[0]
+    if not module_name in sys.modules:
+        if not is_module(module_name):
+            return None
+    try:
+        x = importlib.import_module(module_name)
+    except ImportError:
+        return None
+    for field in tokens[1:]:
+        # As __import__ does, prefer the submodules to the attributes
+        if hasattr(x, '__path__'):
+            submodule = '%s.%s' % (x.__name__, field)
+            if submodule in sys.modules or is_module(submodule):
+                try:
+                    x = importlib.import_module(submodule)
+                except ImportError:
+                    return None
+                continue
+        d = getattr(x, '__dict__', {})
+        if not field in d:
+            return None
+        f = d[field]
+        # "staticmethod" are not functions but descriptors
+        if isinstance(f, staticmethod):
+            f = f.__get__(x, None)
+        x = f
+    return x
+
+
+def is_module(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+def import_name_slow(name):
+    '''
+        The original implementation of import_name(), used to explain
+        why a name cannot be found.
+    '''
     expected = (ImportError,)
     try:
         return __import__(name, fromlist=['dummy'])
@@ -65,7 +138,7 @@ def import_name(name):
                 # other method, don't assume that in "M.x", "M" is a module.
                 # It could be a class as well, and "x" be a staticmethod.
                 try:
-                    module = import_name(module_name)
+                    module = import_name_slow(module_name)
                 except ImportError as e:
                     msg = ('Cannot load %r (tried also with %r):\n' %
                            (name, module_name))
@@ -2,30 +2,44 @@ import os
 from pprint import pformat
 
 import yaml
-from yaml import YAMLError
 
 from conf_tools import logger
-from contracts import describe_type, contract
-from . import ID_FIELD, check_valid_id_or_pattern, substitute_special
+from contracts import describe_type
+from .utils.production import contract
+from . import ID_FIELD
+from .special_subst import substitute_special
+from .valid import check_valid_id_or_pattern
+from .entries_cache import get_entries_cache
 from .exceptions import ConfToolsException, SyntaxMistake, SemanticMistake
+from .formats import get_format_loader, is_streaming_format
 from .patterns import is_pattern
-from .utils import friendly_path, locate_files
+from .utils import friendly_path, get_directory_index
 
 
-def load_entries_from_dir(dirname, pattern):
+def load_entries_from_dir(dirname, pattern, skip=()):
     """ calls load_entries_from_file for each file in dirname respecting
-        the pattern. Environment is not expanded. """
+        the pattern. Environment is not expanded. 
+        
+        The listing of the directory is shared with the other patterns
+        (see DirectoryIndex). The files in skip are not read. """
     # logger.debug('Loading %r from %r' % (dirname, pattern))
     try:
-        filenames = list(locate_files(dirname, pattern))
-        for filename in filenames:
-            for x in load_entries_from_file(filename):
-                yield x
+        filenames = get_directory_index().locate_files(dirname, pattern)
+        filenames = [f for f in filenames if not f in skip]
+        for x in load_entries_from_files(filenames):
+            yield x
     except:
         logger.error('Error while loading dir %r' % friendly_path(dirname))
         raise
 
 
+def load_entries_from_files(filenames):
+    """ calls load_entries_from_file for each file, in order. """
+    for filename in filenames:
+        for x in load_entries_from_file(filename):
+            yield x
+
+
 def load_entries_from_file(filename):
     ''' 
         It is assumed that the file contains a list of dictionaries.
@@ -51,8 +65,31 @@ def load_entries_from_file(filename):
         msg = 'File %r does not exist.' % friendly_path(filename)
         raise SemanticMistake(msg)
 
+    cache = get_entries_cache()
+    if cache is None:
+        records = enumerate_entries_from_file(filename)
+    else:
+        # The cache has the entries as parsed; check_entries() depends
+        # on the environment, so it is run every time.
+        records = cache.load(filename, enumerate_entries_from_data)
+    for x in check_entries(records):
+        yield x
+
+
+def parse_entries(filename, data):
+    """ Parses and checks the entries in the contents of a file. """
+    return check_entries(enumerate_entries_from_data(filename, data))
+
+
+def check_entries(enumeration):
+    """
+        Checks the entries yielded by enumerate_entries_from_file()
+        and resolves the special fields.
+
+        yields (filename, counter), entry
+    """
     name2where = {}
-    for where, x in enumerate_entries_from_file(filename):
+    for where, x in enumeration:
         try:
             if not ID_FIELD in x:
                 msg = 'Entry does not have the %r field' % ID_FIELD
@@ -89,32 +126,55 @@ def load_entries_from_file(filename):
 
 def enumerate_entries_from_file(filename):
     ''' Yields (filename, num_entry), entry '''
-    with open(filename) as f:
-        try:
-            parsed = yaml.load(f)
-        except YAMLError as e:
-            msg = 'Cannot parse YAML file %s:\n%s' % (friendly_path(filename), e)
-            raise SyntaxMistake(msg)  # TODO: make UserError
+    with open(filename, 'rb') as f:
+        if is_streaming_format(filename):
+            # the file is read while parsing
+            for x in enumerate_entries_from_data(filename, f):
+                yield x
+            return
+        data = f.read()
+    for x in enumerate_entries_from_data(filename, data):
+        yield x
 
-        if parsed is None:
-            logger.warning('Found an empty file %r.' % friendly_path(filename))
-        else:
-            if not isinstance(parsed, list):
-                msg = ('Expect the file %r to contain a list of dicts,'
-                       ' found %s.' % (friendly_path(filename),
-                                       describe_type(parsed)))
-                raise SyntaxMistake(msg)
 
-            if not all([isinstance(x, dict) for x in parsed]):
-                msg = ('Expect the file %r to contain a list of dicts.' %
-                       filename)
-                raise SyntaxMistake(msg)
+def enumerate_entries_from_data(filename, data):
+    ''' 
+        Yields (filename, num_entry), entry for the contents of the file
+        (or the open file, for the streaming formats).
+        The format is chosen by the extension (see register_format()).
+    '''
+    parsed = get_format_loader(filename)(filename, data)
+
+    if parsed is None:
+        logger.warning('Found an empty file %r.' % friendly_path(filename))
+    elif isinstance(parsed, list):
+        if not all([isinstance(x, dict) for x in parsed]):
+            msg = ('Expect the file %r to contain a list of dicts.' %
+                   filename)
+            raise SyntaxMistake(msg)
 
-            if not parsed:
-                logger.warning('Found an empty file %r.' % friendly_path(filename))
+        if not parsed:
+            logger.warning('Found an empty file %r.' % friendly_path(filename))
 
-            for num_entry, entry in enumerate(parsed):
-                yield (filename, num_entry), entry
+        for num_entry, entry in enumerate(parsed):
+            yield (filename, num_entry), entry
+    elif hasattr(parsed, '__next__') or hasattr(parsed, 'next'):
+        # The entries are parsed one at a time
+        num_entry = -1
+        for num_entry, entry in enumerate(parsed):
+            if not isinstance(entry, dict):
+                msg = ('Expect the file %r to contain a list of dicts;'
+                       ' entry #%d is %s.' % (filename, num_entry + 1,
+                                              describe_type(entry)))
+                raise SyntaxMistake(msg)
+            yield (filename, num_entry), entry
+        if num_entry == -1:
+            logger.warning('Found an empty file %r.' % friendly_path(filename))
+    else:
+        msg = ('Expect the file %r to contain a list of dicts,'
+               ' found %s.' % (friendly_path(filename),
+                               describe_type(parsed)))
+        raise SyntaxMistake(msg)
 
 
 @contract(entries='list(dict)')
@@ -1,17 +1,27 @@
 from .code_desc import GenericIsinstance
+from .formats import known_format
 from .global_config import GlobalConfig
 from .objspec import ObjectSpec
 from .utils import check_is_in
+from .warmup import Warmup, collect_code_names
 from conf_tools import logger
-from contracts import contract
+from .utils.production import contract
 from io import StringIO
+import six
+
+if six.PY3:
+    from .aio import AsyncMasterMixin
+else:
+    # The awaitable methods need the async syntax of Python 3.
+    class AsyncMasterMixin(object):
+        pass
 
 __all__ = [
     'ConfigMaster',
 ]
         
 
-class ConfigMaster(object):
+class ConfigMaster(AsyncMasterMixin):
     
     @contract(name='str')
     def __init__(self, name):
@@ -27,6 +37,9 @@ class ConfigMaster(object):
         # all the dirs that were passed to load(), in case we miss any
         self._dirs = []
 
+        # Loader used by the specs (None = sequential)
+        self.loader = None
+
         GlobalConfig.register_master(name, self)
         
     def __repr__(self):
@@ -39,7 +52,9 @@ class ConfigMaster(object):
         Adds a type of objects.
         
         :param name:    Informative name
-        :param pattern: Pattern for filenames.
+        :param pattern: Pattern for filenames, or list of patterns.
+                        The format of each file is decided by its extension;
+                        use format_patterns('*.things') to accept all formats.
         :param check:   spect -> {true, false} unction that checks whether a spec is correct
         :param instance: spec -> object function
         :param object_check:  object check function
@@ -49,6 +64,8 @@ class ConfigMaster(object):
                           object_check=object_check,
                           master=self)
 
+        spec.loader = self.loader
+
         self.specs[name] = spec
         self.__dict__[name] = spec
         
@@ -58,14 +75,26 @@ class ConfigMaster(object):
         return spec
     
     
+    def set_loader(self, loader):
+        '''
+            Sets the object used by all specs to load the directories,
+            for example a ParallelLoader. Use None for the default
+            sequential loading.
+        '''
+        self.loader = loader
+        for spec in self.specs.values():
+            spec.loader = loader
+
     def get_classes(self):
         """ Returns a list of strings of the known classes of objects. """
         # TODO: keep order
         return list(self.specs.keys())  
         
     def add_class_generic(self, name, pattern, object_class):
-        if not '.yaml' in pattern or not '*' in pattern:
-            logger.warning('suspicious pattern %r' % pattern)
+        patterns = [pattern] if isinstance(pattern, str) else pattern
+        for p in patterns:
+            if not '*' in p or not known_format(p):
+                logger.warning('suspicious pattern %r' % p)
         from .code_desc import GenericInstance
   
         return self.add_class(name=name, pattern=pattern,
@@ -121,6 +150,60 @@ class ConfigMaster(object):
         # msg = 'Found ' + lists + ' in %r.' % friendly_path(directory)
         # self.debug(msg)
 
+    def reload_changed(self):
+        '''
+            Reloads the files that were added, modified or deleted in
+            all specs (see ObjectSpec.reload_changed()).
+            Returns a dict spec name -> (added, modified, deleted).
+        '''
+        changes = {}
+        for name, spec in self.specs.items():
+            changes[name] = spec.reload_changed()
+        return changes
+
+    def warmup(self, background=True, callback=None):
+        '''
+            Imports the modules of all the code specs in the entries and
+            templates, so that the first instantiation does not pay for 
+            it. The files are read first, in this thread.
+
+            :param background: If True, imports in a daemon thread;
+                use False to do it now (e.g. before forking).
+            :param callback: See Warmup.
+            Returns the Warmup object, with the timings for each name.
+        '''
+        warmup = Warmup(collect_code_names(self), callback=callback)
+        if background:
+            return warmup.start()
+        else:
+            return warmup.run()
+
+    def compile_bundle(self, filename):
+        '''
+            Reads all the configuration and saves it to a single file
+            that can be loaded quickly with load_bundle().
+        '''
+        from .bundle import compile_bundle
+        compile_bundle(self, filename)
+
+    def load_bundle(self, filename, rebuild=True):
+        '''
+            Restores the configuration from a file written by
+            compile_bundle(), instead of parsing the files. 
+
+            Call it after add_class() and load(). If the bundle is 
+            missing or out of date and rebuild is True, the configuration
+            is read normally and the bundle is compiled again.
+
+            Returns True if the bundle was used.
+        '''
+        from .bundle import compile_bundle, load_bundle
+        if load_bundle(self, filename):
+            return True
+        if rebuild:
+            compile_bundle(self, filename)
+        return False
+
     def debug(self, s):
         logger.debug('%s%s' % (self.prefix, s))
 
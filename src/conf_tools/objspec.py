@@ -1,18 +1,40 @@
 from .code_desc import ConfToolsGlobal
 from .code_specs import check_valid_code_spec, instantiate_spec
-from .exceptions import (ConfToolsException, SemanticMistake, 
-    SemanticMistakeKeyNotFound, SyntaxMistake)
-from .load_entries import load_entries_from_dir
-from .patterns import is_pattern, pattern_matches, recursive_subst
+from .exceptions import (ConfToolsException, InstanceManyError, 
+    SemanticMistake, SemanticMistakeKeyNotFound, SyntaxMistake, 
+    describe_error)
+from .entries_cache import file_stamp, get_id_index
+from .instance_cache import InstanceCache, spec_fingerprint
+from .load_entries import load_entries_from_files
+from .patterns import (SubstitutionPlan, TemplateDispatcher, enumerate_pattern, 
+    is_pattern, template_domains)
+from .resolve import CodeGraph
 from .special_subst import substitute_special
-from .utils import (can_be_pickled, expand_environment, expand_string, 
-    friendly_path, indent, termcolor_colored)
+from .utils import (FrozenDict, can_be_pickled, expand_environment, 
+    expand_string, expand_string_lazy, freeze, friendly_path, 
+    get_directory_index, indent, termcolor_colored, thaw)
 from conf_tools import ID_FIELD, logger
-from contracts import contract, describe_type, describe_value
+from contracts import describe_type, describe_value
+from .utils.production import contract
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
 from pprint import pformat
 import os
+import threading
 import traceback
 
+import six
+
+if six.PY3:
+    from .aio import AsyncSpecMixin
+else:
+    # The awaitable methods need the async syntax of Python 3.
+    class AsyncSpecMixin(object):
+
+        def __getstate__(self):
+            return dict(self.__dict__)
+
 
 
 __all__ = [
@@ -20,13 +42,120 @@ __all__ = [
 ]
 
 
-class ObjectSpec(dict):
+def format_list_of_directories(snapshot):
+    """ Describes what was read; see ObjectSpec._directories_snapshot(). """
+    dirs_read, dirs_to_read, files_read, pattern = snapshot
+
+    def dirs():
+        if not dirs_read:
+            return '\nNo dirs read.'
+        s = '\nDirs read:'
+        for d in dirs_read:
+            s += '\n- %s' % friendly_path(d)
+        return s
+
+    def dirs2():
+        if not dirs_to_read:
+            return '\nNo dirs to read.'
+        s = '\nDirs to read:'
+        for d in dirs_to_read:
+            s += '\n- %s' % friendly_path(d)
+        return s
+
+    def files():
+        if not files_read:
+            return '\nNo files read (pattern: %s).' % pattern
+        s = '\nFiles read:'
+        for d in files_read:
+            s += '\n- %s' % friendly_path(d)
+        return s
+
+    # from conf_tools.master import GlobalConfig
+    # x += '\n GlobalConfig dirs: %s' % GlobalConfig._dirs
+
+    return dirs() + files() + dirs2()
+
+
+def instance_or_error(instance_method, spec):
+    """ 
+        Returns a tuple (object, None), or (None, description of the 
+        error). Runs in the executor of instance_many().
+    """
+    try:
+        return instance_method(spec), None
+    except Exception as e:
+        return None, describe_error(e)
+
+
+class TemplatesDict(dict):
+    """ 
+        The templates of an ObjectSpec. It counts its changes, so that the
+        ObjectSpec notices when they are changed directly.
+    """
+
+    version = 0
+
+    def _changed(self):
+        self.version += 1
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._changed()
+
+    def pop(self, *args):
+        self._changed()
+        return dict.pop(self, *args)
+
+    def popitem(self):
+        self._changed()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        self._changed()
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._changed()
+
+    def clear(self):
+        dict.clear(self)
+        self._changed()
+
+
+class ObjectSpec(AsyncSpecMixin, dict):
     """ 
         This is the class that knows how to instance entries. 
         
         Users access it through ConfigMaster.
     
     """
+
+    # How reload_changed() detects modified files: 
+    # 'mtime' (size and mtime) or 'hash' (also the content hash).
+    change_detection = 'mtime'
+
+    # If True, and the entries cache is enabled, looking up one entry
+    # reads only the files that define it and the templates
+    # (see IdIndex); otherwise everything is read at the first access.
+    use_id_index = True
+
+    # Maximum number of entries obtained from templates that are cached
+    # by __getitem__ (0 disables the cache).
+    template_cache_size = 1000
+
+    # Maximum number of keys remembered as not found (0 disables).
+    negative_cache_size = 10000
+
+    # If True, __getitem__ returns read-only views of the entries (see
+    # utils/frozen.py), built once per entry, instead of a copy per call.
+    # Use get_mutable() to obtain a copy that can be modified.
+    read_only = False
+
     def __init__(self, name, pattern, check, instance_method, object_check, master):
         """
             Initializes the structure.
@@ -51,12 +180,57 @@ class ObjectSpec(dict):
         self.files_read = set()
         self.dirs_read = []
         self.dirs_to_read = []
+        # Real paths of the directories already walked
+        self.roots_read = []
         
         # ID -> file where it was found
         self.entry2file = {}
+        # file -> list of IDs found in it
+        self.file2entries = {}
+        # file -> stamp when it was read (see reload_changed())
+        self.file_stamps = {}
+        # ID -> template, for the entries instantiated from a template
+        self._derived_from = {}
 
+        # Bumped when the templates are replaced or changed (together 
+        # with templates.version); the dispatcher is rebuilt if it was
+        # built for a different version.
+        self.templates_version = 0
+        self._dispatcher_version = None
         self.templates = {}
+        # variable -> list of values, see set_domain()
+        self.domains = {}
+        # Finds the template matching a key
+        self.template_dispatcher = TemplateDispatcher()
+        # ID -> entry obtained from a template, in LRU order
+        self.template_cache = OrderedDict()
+        self.template_cache_hits = 0
+        self.template_cache_misses = 0
+        # template name -> SubstitutionPlan
+        self.subst_plans = {}
+        # keys that are known not to be entries nor to match templates
+        self.missing_keys = set()
+        # ID -> (entry, read-only view of it), see read_only
+        self._frozen = {}
+
+        # directory -> valid IdIndex record, for the dirs to read
+        self._index_records = {}
+        # True while reading only some files (see _load_for_key())
+        self._loading_some = False
+        # True while reading all the directories
+        self._loading_all = False
+
+        # Held by the lookups and by reload_changed(), which might be
+        # called by another thread (see ConfigWatcher).
+        self._lock = threading.RLock()
+
+        # Object used to load the directories (e.g. a ParallelLoader);
+        # if None, the files are read sequentially.
+        self.loader = None
 
+        # InstanceCache used by instance(); None if disabled
+        # (see enable_instance_cache()).
+        self.instance_cache = None
 
         if not can_be_pickled(check):
             msg = 'Function %s passed as "check" cannot be pickled. ' % (check)
@@ -73,15 +247,41 @@ class ObjectSpec(dict):
             # TODO: add where (2 levels up)
             logger.warning(msg)
 
+    def __getstate__(self):
+        state = AsyncSpecMixin.__getstate__(self)
+        # The plans contain closures; they are rebuilt when needed.
+        state['subst_plans'] = {}
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.RLock()
+
+    @property
+    def templates(self):
+        """ Template name -> template (a TemplatesDict). """
+        return self._templates
+
+    @templates.setter
+    def templates(self, templates):
+        self._templates = TemplatesDict(templates)
+        self.templates_version += 1
+
     def __repr__(self):
         return ('ObjectSpec(%s;fread:%s;dread:%s;dtoread:%s)' % 
                 (self.name, self.files_read, self.dirs_read, self.dirs_to_read))
     
     def make_sure_everything_read(self):
         """ Reads the rest of the directories that we need to read. """
-        while self.dirs_to_read:
-            d = self.dirs_to_read.pop(0)
-            self._actually_load(d)
+        loading_all = self._loading_all
+        self._loading_all = True
+        try:
+            while self.dirs_to_read:
+                d = self.dirs_to_read.pop(0)
+                self._actually_load(d)
+        finally:
+            self._loading_all = loading_all
 
     def load_config_from_directory(self, directory):
         """ 
@@ -90,39 +290,171 @@ class ObjectSpec(dict):
         """
         self.dirs_to_read.append(directory)
              
+    # The dict methods that change the entries must invalidate
+    # the caches of the lookups.
+
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self._entries_changed()
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._entries_changed()
+
+    def pop(self, *args):
+        try:
+            return dict.pop(self, *args)
+        finally:
+            self._entries_changed()
+
+    def popitem(self):
+        try:
+            return dict.popitem(self)
+        finally:
+            self._entries_changed()
+
+    def setdefault(self, key, default=None):
+        try:
+            return dict.setdefault(self, key, default)
+        finally:
+            self._entries_changed()
+
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self._entries_changed()
+
+    def clear(self):
+        dict.clear(self)
+        self._entries_changed()
+
+    # The ids are copied while holding the lock, as reload_changed()
+    # might change the entries while the caller is iterating.
+
     def __iter__(self):
-        self.make_sure_everything_read()
-        return dict.__iter__(self)
+        return iter(self.keys())
         
     def keys(self):
-        self.make_sure_everything_read()
-        return dict.keys(self)
+        with self._lock:
+            self.make_sure_everything_read()
+            return list(dict.keys(self))
         
+    def _make_sure_read(self, key):
+        """ Reads what is needed to look up the given key. """
+        if self._loading_some:
+            return
+        if self._loading_all or not self._load_for_key(key):
+            self.make_sure_everything_read()
+
+    def _load_for_key(self, key):
+        """
+            Reads only the files that define the key, plus those that
+            define templates, using the IdIndex.
+            Returns False if the index cannot be used.
+        """
+        if not self.dirs_to_read:
+            return True
+        if not self.use_id_index:
+            return False
+        id_index = get_id_index()
+        if id_index is None:
+            return False
+
+        needed = []
+        for directory in self.dirs_to_read:
+            if directory in self.dirs_read:
+                continue
+            record = self._index_records.get(directory, None)
+            if record is None:
+                record = id_index.lookup(self._resolve_directory(directory),
+                                         self.pattern, self._file_stamp)
+                if record is None:
+                    return False
+                self._index_records[directory] = record
+            files = set(record['name2files'].get(key, []))
+            files.update(record['template_files'])
+            for f in record['filenames']:
+                if f in files and not f in self.files_read \
+                        and not f in needed:
+                    needed.append(f)
+
+        self._loading_some = True
+        try:
+            self._load_files(needed)
+        finally:
+            self._loading_some = False
+        return True
+
     @contract(key='str')
     def __contains__(self, key):
-        self.make_sure_everything_read()
-        return dict.__contains__(self, key) or self.matches_any_pattern(key)
+        with self._lock:
+            return self._contains(key)
+
+    def _contains(self, key):
+        self._make_sure_read(key)
+        # If the templates were changed directly, this forgets the
+        # missing keys.
+        self._sync_dispatcher()
+        if key in self.missing_keys:
+            return False
+        found = dict.__contains__(self, key) or self.matches_any_pattern(key)
+        if not found:
+            self._remember_missing(key)
+        return found
+
+    def _remember_missing(self, key):
+        if len(self.missing_keys) >= self.negative_cache_size:
+            self.missing_keys.clear()
+        if self.negative_cache_size > 0:
+            self.missing_keys.add(key)
 
 
     @contract(key='str')
     def __getitem__(self, key):
-        self.make_sure_everything_read()
+        with self._lock:
+            return self._getitem(key)
+
+    def _getitem(self, key):
+        self._make_sure_read(key)
         # Check if it is available literally:
         if dict.__contains__(self, key):
+            if self.read_only:
+                return self._frozen_entry(key)
             # Note: we copy
             return dict.__getitem__(self, key).copy()
         else:
-            pattern = self.matches_any_pattern(key)
+            self._sync_dispatcher()
+            cache = self.template_cache
+            if key in cache:
+                self.template_cache_hits += 1
+                # move to the end
+                x = cache[key] = cache.pop(key)
+                if self.read_only:
+                    return freeze(x)
+                # The cache might have been filled in read-only mode
+                return thaw(x) if isinstance(x, FrozenDict) else deepcopy(x)
+
+            if key in self.missing_keys:
+                raise SemanticMistakeKeyNotFound(key, self)
+            pattern, matches = self._best_template(key)
             if pattern is None:
+                self._remember_missing(key)
                 raise SemanticMistakeKeyNotFound(key, self)
 
             spec_template = self.templates[pattern]
-            matches = pattern_matches(pattern, key)
             try:
-                x = recursive_subst(spec_template, **matches)
+                plan = self.subst_plans.get(pattern, None)
+                if plan is None:
+                    plan = SubstitutionPlan(spec_template)
+                    self.subst_plans[pattern] = plan
+                # Note: substitute_special() copies the parts shared
+                # with the plan
+                x = plan.apply(matches)
                 # We didn't do it before...
                 dirname = os.path.dirname(self.entry2file[pattern])
                 x = substitute_special(x, dirname=dirname)
+                if self.read_only:
+                    x = freeze(x)
+                self._cache_template_entry(key, x)
                 return x
             except (SyntaxMistake, SemanticMistake) as e:
                 prefix = '    | '
@@ -135,45 +467,78 @@ class ObjectSpec(dict):
                        ))
                 raise ConfToolsException(msg)
 
+    def _frozen_entry(self, key):
+        """ Returns the read-only view of the entry, building it once. """
+        entry = dict.__getitem__(self, key)
+        cached = self._frozen.get(key, None)
+        # The entry might have been replaced since
+        if cached is None or cached[0] is not entry:
+            cached = (entry, freeze(entry))
+            self._frozen[key] = cached
+        return cached[1]
+
+    @contract(id_object='str', returns='dict')
+    def get_mutable(self, id_object):
+        """ 
+            Returns a deep copy of the entry, that can be modified 
+            also when read_only is set. 
+        """
+        return thaw(self[id_object])
+
+    def _cache_template_entry(self, key, x):
+        self.template_cache_misses += 1
+        if self.template_cache_size > 0:
+            # The read-only views can be shared
+            if not self.read_only:
+                x = deepcopy(x)
+            self.template_cache[key] = x
+            while len(self.template_cache) > self.template_cache_size:
+                self.template_cache.popitem(last=False)
+
+    def _templates_changed(self):
+        """ 
+            Called when templates are added or removed, after updating
+            the dispatcher.
+        """
+        self.templates_version += 1
+        self._dispatcher_version = self._templates_key()
+        self.template_cache.clear()
+        self.subst_plans.clear()
+        self._entries_changed()
+
+    def _templates_key(self):
+        return self.templates_version, self.templates.version
+
+    def _entries_changed(self):
+        """ Called when entries are added or removed. """
+        # When unpickling, the entries are set before the attributes.
+        if 'missing_keys' in self.__dict__:
+            self.missing_keys.clear()
+
     @contract(key='str', returns='None|str')
     def matches_any_pattern(self, key):
-        self.make_sure_everything_read()
+        self._make_sure_read(key)
+        return self._best_template(key)[0]
+
+    def _best_template(self, key):
+        """ 
+            Returns a tuple (template, matches) for the template that
+            matches the key, or (None, None). 
+        """
+        self._sync_dispatcher()
+        return self.template_dispatcher.lookup(key)
 
-        possibilities = []
-        # Look for the template that can match the longer
+    def _sync_dispatcher(self):
+        if self._dispatcher_version != self._templates_key():
+            # self.templates was changed directly
+            self._rebuild_dispatcher()
+
+    def _rebuild_dispatcher(self):
+        self.template_dispatcher = TemplateDispatcher()
         for template in self.templates:
-            matches = pattern_matches(template, key)
-            if matches:
-                score = -sum(len(x) for x in matches.values())
-                possibilities.append((score, template, matches))
-                
-        # no matches
-        if not possibilities:
-            return None
-        
-        # only one match
-        if len(possibilities) == 1:
-            return possibilities[0][1]
-        
-        # sort by score
-        possibilities.sort(key=lambda p: (-p[0]))
+            self.template_dispatcher.add(template)
+        self._templates_changed()
 
-        # Check if there is a tie
-        best = possibilities[0][0]
-        ties = [p[1] for p in possibilities if p[0] == best]
-    
-        if len(ties) >= 2:
-            msg = ('Detected a tie. Key %r matches with same score: %r' % 
-                   (key, ties))
-            raise ValueError(msg)
-        
-#        if len(possibilities) >= 2:
-#            for score, template, _ in possibilities:
-#                print(' score: %s template %s' % (score, template))
-#
-#            print('best: %r' % possibilities[0][1])
-#            
-        return possibilities[0][1]
 #        if not patterns:
 #            return None
 #        if len(patterns) > 1:
@@ -209,39 +574,156 @@ class ObjectSpec(dict):
         """ Instances the entry with the given ID. """
         if not isinstance(id_object, str):
             raise ValueError('Expected string; got %r' % id_object)
-        self.make_sure_everything_read()
+        self._make_sure_read(id_object)
 
         spec = self[id_object]
-        try:
-            value = self.instance_spec(spec)
-        except Exception as e:
-            msg = 'Could not instance the object %r\n' % id_object
-            if id_object in self.entry2file:
-                msg += 'defined at %s\n' % self.entry2file[id_object]
-            else:
-                msg += '(origin unknown)\n'
-            msg += 'because of this error:\n'
-            if isinstance(e, ConfToolsException):
-                st = str(e)
-            else:  
-                st = traceback.format_exc()
-            msg += indent(st.strip(), '| ')
+        return self._instance_cached(id_object, spec)
 
-            # from conf_tools.master import GlobalConfig
+    def _instance_cached(self, id_object, spec, resolved=None):
+        """
+            :param resolved: If given, the spec passed to the instance 
+                method instead of spec, with the parameters already 
+                built (see CodeGraph). 
+        """
+        cache = self.instance_cache
+        if cache is not None:
+            return cache.get(id_object, spec_fingerprint(spec),
+                             lambda: self._instance(id_object, spec, resolved))
+        return self._instance(id_object, spec, resolved)
 
-            # msg += '\n the conf is %s' % self
-            
-            raise ConfToolsException(msg)
+    def _instance(self, id_object, spec, resolved=None):
+        try:
+            value = self.instance_spec(spec if resolved is None else resolved)
+        except Exception as e:
+            raise self._instance_error(id_object, describe_error(e))
 
         if self.user_check is not None:
             self.user_check(spec)
         return value
 
+    def _instance_error(self, id_object, st):
+        """ Returns the exception raised by instance(). """
+        msg = 'Could not instance the object %r\n' % id_object
+        if id_object in self.entry2file:
+            msg += 'defined at %s\n' % self.entry2file[id_object]
+        else:
+            msg += '(origin unknown)\n'
+        msg += 'because of this error:\n'
+        msg += indent(st.strip(), '| ')
+
+        # from conf_tools.master import GlobalConfig
+
+        # msg += '\n the conf is %s' % self
+
+        return ConfToolsException(msg)
+
+    @contract(ids='list(str)', returns='list')
+    def instance_many(self, ids, executor=None):
+        """
+            Instances the entries with the given IDs concurrently, and 
+            returns the objects in the same order (the IDs repeated are 
+            instanced only once).
+
+            :param executor: A concurrent.futures executor; if it is a 
+                ProcessPoolExecutor, the "instance_method" function, the 
+                entries, and the objects must be picklable. By default, 
+                a pool of threads is used.
+
+            If some objects cannot be instanced, all the others are built
+            anyway and then InstanceManyError is raised, with the error
+            for each ID as it would be raised by instance().
+        """
+        if self.instance_method is None:
+            msg = 'No instance method specified for %s.' % self.name
+            raise ValueError(msg)
+
+        unique = list(OrderedDict.fromkeys(ids))
+        results = {}
+        errors = OrderedDict()
+        specs = {}
+        cache = self.instance_cache
+        todo = []
+        # Not held while instancing: the workers might look up entries.
+        with self._lock:
+            for id_object in unique:
+                try:
+                    self._make_sure_read(id_object)
+                    spec = specs[id_object] = self[id_object]
+                except ConfToolsException as e:
+                    errors[id_object] = e
+                    continue
+                if cache is not None:
+                    found, value = cache.peek(id_object,
+                                              spec_fingerprint(spec))
+                    if found:
+                        results[id_object] = value
+                        continue
+                todo.append(id_object)
+
+        if todo:
+            own_executor = executor is None
+            if own_executor:
+                executor = ThreadPoolExecutor(max_workers=min(32, len(todo)))
+            try:
+                futures = [executor.submit(instance_or_error,
+                                           self.instance_method, specs[i])
+                           for i in todo]
+                for id_object, future in zip(todo, futures):
+                    try:
+                        value, st = future.result()
+                    except Exception as e:
+                        # for example, objects that cannot be pickled
+                        value, st = None, describe_error(e)
+                    if st is not None:
+                        errors[id_object] = self._instance_error(id_object, st)
+                        continue
+                    spec = specs[id_object]
+                    if self.user_check is not None:
+                        try:
+                            self.user_check(spec)
+                        except Exception as e:
+                            errors[id_object] = self._instance_error(
+                                id_object, describe_error(e))
+                            continue
+                    results[id_object] = value
+                    if cache is not None:
+                        cache.put(id_object, spec_fingerprint(spec), value)
+            finally:
+                if own_executor:
+                    executor.shutdown()
+
+        if errors:
+            errors = OrderedDict((i, errors[i]) for i in unique if i in errors)
+            raise InstanceManyError(errors, results)
+        return [results[id_object] for id_object in ids]
+
+    @contract(id_object='str')
+    def instance_resolved(self, id_object, executor=None):
+        """
+            Instances the entry, building first the code specs and the
+            references ({'$ref': 'id'} or {'$ref': 'spec:id'}) found in 
+            its parameters, concurrently where possible (see CodeGraph).
+        """
+        self._make_sure_read(id_object)
+        graph = CodeGraph(self.master)
+        root = graph.add_ref(id_object, self.name)
+        return graph.run(root, executor)
+
+    def enable_instance_cache(self, policy='lru', max_size=100, ttl=None):
+        """ 
+            Caches the objects created by instance(); see InstanceCache
+            for the parameters. Returns the cache.
+        """
+        self.instance_cache = InstanceCache(policy=policy, max_size=max_size,
+                                            ttl=ttl)
+        return self.instance_cache
+
+    def disable_instance_cache(self):
+        self.instance_cache = None
+
     @contract(spec='dict')
     def instance_spec(self, spec):
         """ Instances the given spec using the "instance_method" function. """
-        self.make_sure_everything_read()
-
         if self.instance_method is None:
             msg = 'No instance method specified for %s.' % self.name
             raise ValueError(msg)
@@ -263,8 +745,6 @@ class ObjectSpec(dict):
                 id_dog, dog = config.specs['dogs'].instance_smart(spec)
                 
         """
-        self.make_sure_everything_read()
-
         if isinstance(id_or_spec, str):
             return id_or_spec, self.instance(id_or_spec)
         elif isinstance(id_or_spec, dict):
@@ -289,8 +769,6 @@ class ObjectSpec(dict):
                 the check function.
                 
         """
-        self.make_sure_everything_read()
-
         if isinstance(id_or_spec_or_code, (str, dict)):
             id_or_spec = id_or_spec_or_code
             return self.instance_smart(id_or_spec)
@@ -317,8 +795,30 @@ class ObjectSpec(dict):
         if directory in self.dirs_read:
             self.dirs_read.remove(directory)
 
+        # Walk the directory again to find new files
+        resolved = self._resolve_directory(directory)
+        index = get_directory_index()
+        index.invalidate(resolved)
+        real = os.path.realpath(resolved)
+        self.roots_read = [r for r in self.roots_read
+                           if not index.covers(r, real)]
+        self._index_records.pop(directory, None)
+
         self.load_config_from_directory(directory)
 
+    def _resolve_directory(self, directory):
+        """ Expands package names and environment variables. """
+        from .global_config import dir_from_package_name, looks_like_package_name
+
+        if looks_like_package_name(directory):
+            # print('%r looks like a package' % directory)
+            directory = dir_from_package_name(directory)
+        else:
+            # print('%r is plain looking' % directory)
+            pass
+
+        return expand_environment(directory)
+
     def _actually_load(self, directory):
         """ 
             Loads all files in the directory, recursively, using 
@@ -329,32 +829,80 @@ class ObjectSpec(dict):
             # print('skipping directory %r because already read' % directory)
             return
         self.dirs_read.append(directory)
-        
-        from .global_config import dir_from_package_name, looks_like_package_name
-
-        if looks_like_package_name(directory):
-            # print('%r looks like a package' % directory)
-            directory = dir_from_package_name(directory)
-        else:
-            # print('%r is plain looking' % directory)
-            pass
+        directory0 = directory
 
         # print('actually loading directory %r for %s' % (directory, self.pattern))
-        directory = expand_environment(directory)
+        directory = self._resolve_directory(directory)
 
         if not os.path.exists(directory):
             msg = 'Directory %r does not exist.' % directory
             raise SemanticMistake(msg)
 
+        # Skip the directory if it was already walked as part of another one
+        real = os.path.realpath(directory)
+        index = get_directory_index()
+        for root in self.roots_read:
+            if index.covers(root, real):
+                # print('skipping %r because inside %r' % (directory, root))
+                return 0
+
+        # Files already read are skipped without opening them
+        filenames = [f for f in index.locate_files(directory, self.pattern)
+                     if not f in self.files_read]
+        try:
+            nfound = self._load_files(filenames)
+        except:
+            logger.error('Error while loading dir %r' % friendly_path(directory))
+            raise
+
+        self.roots_read.append(real)
+        self._index_records.pop(directory0, None)
+        self._store_index(directory)
+
+        return nfound
+
+    def _store_index(self, directory):
+        """ Stores the IdIndex record for a directory just read. """
+        id_index = get_id_index()
+        if id_index is None or not self.use_id_index:
+            return
+        filenames = get_directory_index().locate_files(directory, self.pattern)
+        stamps = dict((f, self.file_stamps[f]) for f in filenames
+                      if f in self.file_stamps)
+        if len(stamps) != len(filenames):
+            # Some files were read as part of another directory
+            return
+        id_index.store(directory, self.pattern, stamps, self.file2entries,
+                       is_pattern)
+
+    def _load_files(self, filenames):
+        """ Reads the files and adds their entries. """
+        for filename in filenames:
+            self.file_stamps[filename] = self._file_stamp(filename)
+        return self._add_entries(self._read_files(filenames), filenames)
+
+    def _read_files(self, filenames):
+        """ Yields (filename, counter), entry for the files, in order. """
+        if self.loader is None:
+            return load_entries_from_files(filenames)
+        else:
+            return self.loader.load_entries_from_files(filenames)
+
+    def _file_stamp(self, filename):
+        return file_stamp(filename, use_hash=self.change_detection == 'hash')
+
+    def _add_entries(self, entries, filenames):
+        """
+            Adds the entries read from the given files.
+            Returns the number of new entries found.
+        """
         nfound = 0
-        files = set()
 
-        for where, x in load_entries_from_dir(directory, self.pattern):
+        for where, x in entries:
             # logger.debug('loading %s:%s %s' % (where[0], where[1], x))
             filename = where[0]
             if filename in self.files_read:
                 continue
-            files.add(filename)
 
             name = x[ID_FIELD]
 
@@ -383,6 +931,8 @@ class ObjectSpec(dict):
 
             if is_pattern(name):
                 self.templates[name] = x
+                self.template_dispatcher.add(name)
+                self._templates_changed()
             else:
                 DESC_FIELD = 'desc'
                 # If it only contains the "id" field, then we try
@@ -391,7 +941,8 @@ class ObjectSpec(dict):
                 only_id_and_desc = set(x.keys()) == set([ID_FIELD, DESC_FIELD]) 
                  
                 if only_id or only_id_and_desc:
-                    if not self.matches_any_pattern(name):
+                    template = self.matches_any_pattern(name)
+                    if not template:
                         msg = ('While trying to instantiate empty entry %r '
                                'in %s, I could not find any pattern matching.'
                                % (name, friendly_path(filename)))
@@ -399,7 +950,7 @@ class ObjectSpec(dict):
                         raise SemanticMistake(msg)
 
                     try:
-                        x2 = self.__getitem__(name)
+                        x2 = self.get_mutable(name)
                     except ConfToolsException:
                         raise
                     assert x[ID_FIELD] == name
@@ -407,6 +958,7 @@ class ObjectSpec(dict):
                     if only_id_and_desc:
                         x2[DESC_FIELD] = x[DESC_FIELD]  
                     x = x2 
+                    self._derived_from[name] = template
                     
                 try:
                     self.check(x)
@@ -421,13 +973,137 @@ class ObjectSpec(dict):
                 dict.__setitem__(self, name, x)
 
             self.entry2file[name] = filename
+            self.file2entries.setdefault(filename, []).append(name)
+            self._entries_changed()
 
             nfound += 1
 
-        self.files_read.update(files)
+        self.files_read.update(filenames)
 
         return nfound
-    
+
+    def reload_changed(self):
+        """
+            Reloads the files that were added, modified or deleted
+            since they were read, replacing only the entries and
+            templates that they define (and the entries that were
+            instantiated from those templates).
+
+            The lookups from other threads wait until it is done.
+
+            Returns a tuple (added, modified, deleted) of lists of files.
+        """
+        with self._lock:
+            return self._reload_changed()
+
+    def _reload_changed(self):
+        self.make_sure_everything_read()
+
+        index = get_directory_index()
+        current = set()
+        for root in self.roots_read:
+            index.invalidate(root)
+            current.update(index.locate_files(root, self.pattern))
+
+        known = set(self.file_stamps)
+        added = sorted(current - known)
+        deleted = sorted(known - current)
+        modified = sorted(f for f in current & known
+                          if self._file_stamp(f) != self.file_stamps[f])
+        if not (added or modified or deleted):
+            return added, modified, deleted
+
+        # Find all the files whose entries must be replaced
+        affected = set(modified) | set(deleted)
+        while True:
+            names = set()
+            for f in affected:
+                names.update(self.file2entries.get(f, []))
+            more = set()
+            # entries defined (identically) also in other files
+            for f, defined in self.file2entries.items():
+                if not f in affected and names.intersection(defined):
+                    more.add(f)
+            # entries obtained from the templates that change
+            for name, template in self._derived_from.items():
+                if template in names and not self.entry2file[name] in affected:
+                    more.add(self.entry2file[name])
+            if not more:
+                break
+            affected.update(more)
+
+        to_read = [f for f in affected if not f in deleted] + added
+        to_read.sort(key=self._file_order)
+
+        # Parse everything before changing anything, so that if there is 
+        # an error the old entries are kept, and the files are read again
+        # at the next call. The stamps are taken before reading, so that 
+        # a file modified while being read is read again.
+        stamps = dict((f, self._file_stamp(f)) for f in to_read)
+        entries = list(self._read_files(to_read))
+
+        # If the new entries are not valid, go back to the old ones.
+        snapshot = self._snapshot()
+        try:
+            for filename in affected:
+                for name in self.file2entries.pop(filename, []):
+                    self._remove_entry(name)
+                self.files_read.discard(filename)
+            self._add_entries(entries, to_read)
+        except:
+            self._restore(snapshot)
+            raise
+
+        for filename in deleted:
+            del self.file_stamps[filename]
+        self.file_stamps.update(stamps)
+
+        logger.debug('%s: reloaded %d files (%d added, %d modified, '
+                     '%d deleted)' % (self.name, len(to_read), len(added),
+                                      len(modified), len(deleted)))
+        return added, modified, deleted
+
+    def _snapshot(self):
+        """ Returns a copy of the state changed by reload_changed(). """
+        return dict(entries=dict.copy(self),
+                    templates=dict(self.templates),
+                    entry2file=dict(self.entry2file),
+                    file2entries=dict((f, list(names)) for f, names
+                                      in self.file2entries.items()),
+                    _derived_from=dict(self._derived_from),
+                    files_read=set(self.files_read))
+
+    def _restore(self, snapshot):
+        """ Restores the state saved by _snapshot(). """
+        dict.clear(self)
+        dict.update(self, snapshot['entries'])
+        for k in ['templates', 'entry2file', 'file2entries',
+                  '_derived_from', 'files_read']:
+            setattr(self, k, snapshot[k])
+        self._rebuild_dispatcher()
+
+    def _file_order(self, filename):
+        """ Sort key that gives the order in which the files are loaded. """
+        for i, root in enumerate(self.roots_read):
+            if filename.startswith(root.rstrip(os.sep) + os.sep):
+                return i, filename
+        return len(self.roots_read), filename
+
+    def _remove_entry(self, name):
+        """ Forgets the entry or template with the given name. """
+        if dict.__contains__(self, name):
+            dict.__delitem__(self, name)
+        self.templates.pop(name, None)
+        if name in self.template_dispatcher:
+            self.template_dispatcher.remove(name)
+            self._templates_changed()
+        self._entries_changed()
+        self.entry2file.pop(name, None)
+        self._derived_from.pop(name, None)
+        self._frozen.pop(name, None)
+        if self.instance_cache is not None:
+            self.instance_cache.invalidate(name)
+
     def summary_string_id_desc(self):
         """ Assuming that the entries are dictionaries
             with fields 'id' and 'desc', returns a summary string. 
@@ -461,40 +1137,15 @@ class ObjectSpec(dict):
         return s 
     
     def _formatted_list_of_directories(self):
-        
-        def dirs():
-            if not self.dirs_read:
-                return '\nNo dirs read.'
-            s = '\nDirs read:'
-            for d in self.dirs_read:
-                s += '\n- %s' % friendly_path(d)
-            return s
-
-        def dirs2():
-            if not self.dirs_to_read:
-                return '\nNo dirs to read.'
-            s = '\nDirs to read:'
-            for d in self.dirs_to_read:
-                s += '\n- %s' % friendly_path(d)
-            return s
-        
-        def files():
-            if not self.files_read:
-                return '\nNo files read (pattern: %s).' % self.pattern
-            s = '\nFiles read:'
-            for d in self.files_read:
-                s += '\n- %s' % friendly_path(d)
-            return s
-        
-        x = dirs() + files() + dirs2()
-        
-        # from conf_tools.master import GlobalConfig
-        # x += '\n GlobalConfig dirs: %s' % GlobalConfig._dirs
-        
-        return x
-        
-    @contract(names='str|list(str)', returns='list(str)')
-    def expand_names(self, names):
+        return format_list_of_directories(self._directories_snapshot())
+
+    def _directories_snapshot(self):
+        """ The arguments of format_list_of_directories(). """
+        return (tuple(self.dirs_read), tuple(self.dirs_to_read),
+                tuple(self.files_read), self.pattern)
+
+    @contract(names='str|list(str)', templates='bool', returns='list(str)')
+    def expand_names(self, names, templates=False):
         """ 
             The most flexible expansion routine on the planet.
         
@@ -504,7 +1155,13 @@ class ObjectSpec(dict):
                 config.widgets.expand_names('a,b*')
                 config.widgets.expand_names(['a','b*'])
                 
+            If templates is True, the wildcards are matched also against
+            the ids generated by the templates (see iterate_ids()).
         """
+        with self._lock:
+            return self._expand_names(names, templates)
+
+    def _expand_names(self, names, templates):
         self.make_sure_everything_read()
 
         if len(self) == 0 and len(self.templates) == 0:
@@ -517,8 +1174,11 @@ class ObjectSpec(dict):
         assert isinstance(names, list)
          
         try:
-            options = self.keys()
-            expanded = expand_string(names, options)
+            options = list(self.keys())
+            if templates:
+                expanded = expand_string_lazy(names, self._wildcard_universe)
+            else:
+                expanded = expand_string(names, options)
         except ValueError:
             expanded = []
             
@@ -529,6 +1189,80 @@ class ObjectSpec(dict):
     
         return expanded
     
+    def _wildcard_universe(self, wildcard):
+        """ The ids that could match the wildcard, as a generator. """
+        prefix = wildcard[:wildcard.index('*')]
+        self._sync_dispatcher()
+        for name in dict.keys(self):
+            yield name
+        for template in self.templates:
+            c = self.template_dispatcher.compiled[template]
+            # skip the templates that cannot match
+            if not (c.prefix.startswith(prefix) or prefix.startswith(c.prefix)):
+                continue
+            for name in self.iterate_template_ids(template):
+                yield name
+
+    @contract(variable='str')
+    def set_domain(self, variable, values):
+        """
+            Declares the values that a template variable can take,
+            for iterate_ids(). If the variable is also used with an 
+            option table, only the values in the table are used.
+        """
+        self.domains[variable] = [str(v) for v in values]
+
+    def iterate_ids(self):
+        """
+            Yields all the ids: first those of the entries, then those
+            generated by the templates (see iterate_template_ids()).
+            The ids are generated one at a time.
+        """
+        with self._lock:
+            self.make_sure_everything_read()
+            names = list(dict.keys(self))
+            templates = list(self.templates)
+        for name in names:
+            yield name
+        for template in templates:
+            for name in self.iterate_template_ids(template):
+                yield name
+
+    @contract(template='str')
+    def iterate_template_ids(self, template):
+        """
+            Yields the ids that the template can generate, when all its
+            variables have a finite domain: an option table used in 
+            the template (like "${size|small=1;big=2}"), or the values
+            declared with set_domain(). Yields nothing otherwise. 
+
+            Only the ids that are not entries and that resolve to this 
+            template are yielded.
+        """
+        self.make_sure_everything_read()
+        try:
+            domains = template_domains(self.templates[template])
+        except SyntaxMistake:  # invalid option table
+            return
+        for k, values in self.domains.items():
+            if k in domains:
+                domains[k] = [v for v in domains[k] if v in values]
+            else:
+                domains[k] = values
+        try:
+            generated = enumerate_pattern(template, domains)
+            for name, _ in generated:
+                if dict.__contains__(self, name):
+                    continue
+                try:
+                    best, _ = self._best_template(name)
+                except ValueError:  # tie
+                    continue
+                if best == template:
+                    yield name
+        except ValueError:  # some variable has no domain
+            return
+
     @contract(id_spec='str', desc='str', code='code_spec')
     def add_spec(self, id_spec, desc, code):
         """ Adds manually one spec. """
@@ -538,6 +1272,7 @@ class ObjectSpec(dict):
         assert not id_spec in self
         # TODO: check doesn't exist
         self[spec['id']] = spec
+        self._entries_changed()
     
     def print_summary(self, stream, instance=False, raise_instance_error=False):
         self.make_sure_everything_read()
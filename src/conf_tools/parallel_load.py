@@ -0,0 +1,257 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import atexit
+import os
+import sys
+import weakref
+
+from . import ConfToolsGlobal, logger
+from .entries_cache import get_entries_cache
+from .exceptions import ConfToolsException, SemanticMistake
+from .formats import FormatsGlobal
+from .load_entries import check_entries, enumerate_entries_from_data
+from .utils import can_be_pickled, friendly_path, get_directory_index
+
+__all__ = [
+    'ParallelLoader',
+]
+
+
+def read_file(filename):
+    """ Returns the contents of the file as bytes. """
+    if not os.path.exists(filename):
+        msg = 'File %r does not exist.' % friendly_path(filename)
+        raise SemanticMistake(msg)
+    with open(filename, 'rb') as f:
+        return f.read()
+
+
+def parse_entries_partial(filename, data, config=None):
+    """
+        Parses the contents of a file; runs in the parse executor.
+        The entries are checked by the caller (see check_entries()).
+
+        Returns a tuple (entries, exception) where entries are the
+        ones read before the error, if any, so that the caller can
+        reproduce exactly the sequential behavior.
+
+        If given, the config (see get_format_config()) is installed
+        first; this is done for the pools without an initializer.
+    """
+    if config is not None:
+        init_worker(config)
+    entries = []
+    try:
+        for x in enumerate_entries_from_data(filename, data):
+            entries.append(x)
+    except ConfToolsException as e:
+        return entries, e
+    return entries, None
+
+
+def get_format_config():
+    """ 
+        Returns the settings that affect the parsing, which are passed
+        to the worker processes (see init_worker()).
+    """
+    return dict(loaders=dict(FormatsGlobal.loaders),
+                default_extension=FormatsGlobal.default_extension,
+                use_libyaml=ConfToolsGlobal.use_libyaml)
+
+
+def picklable_format_config(config):
+    """ Returns the config without the loaders that cannot be pickled. """
+    loaders = {}
+    for extension, loader in sorted(config['loaders'].items()):
+        if can_be_pickled(loader):
+            loaders[extension] = loader
+        else:
+            msg = ('The loader %r for %r cannot be pickled; the worker '
+                   'processes will use the one registered when they were '
+                   'started.' % (loader, extension))
+            logger.warning(msg)
+    return dict(config, loaders=loaders)
+
+
+def init_worker(config):
+    """ Initializer of the worker processes; see get_format_config(). """
+    FormatsGlobal.loaders.update(config['loaders'])
+    FormatsGlobal.default_extension = config['default_extension']
+    ConfToolsGlobal.use_libyaml = config['use_libyaml']
+
+
+def shutdown_executors(executors):
+    """ Shuts down the executors and empties the list. """
+    for executor in executors:
+        executor.shutdown()
+    del executors[:]
+
+
+class ParallelLoader(object):
+    """
+        Loads the configuration files of a directory concurrently:
+        the files are read by the io_executor (a pool of threads)
+        and parsed by the parse_executor (by default, a pool of processes).
+
+        The entries are yielded in the same order as load_entries_from_dir().
+
+        The worker processes get the formats registered and the value
+        of ConfToolsGlobal.use_libyaml when they are started; if those
+        change, the pool is restarted. (This applies only to the pool
+        created by the ParallelLoader, not to a parse_executor given.)
+
+        The executors created are shut down by shutdown(), at the end 
+        of a "with" block, when the object is garbage collected, or 
+        at exit.
+
+        Usage: ..
+
+            master.set_loader(ParallelLoader())
+
+        or: ..
+
+            with ParallelLoader() as loader:
+                master.set_loader(loader)
+                master.load(dirname)
+                ...
+
+    """
+
+    def __init__(self, io_executor=None, parse_executor=None,
+                 max_io_workers=8, max_parse_workers=None):
+        """
+            :param io_executor: Executor used to read the files.
+            :param parse_executor: Executor used to parse the files.
+
+            If not given, the executors are created when needed.
+        """
+        self.io_executor = io_executor
+        self.parse_executor = parse_executor
+        self.max_io_workers = max_io_workers
+        self.max_parse_workers = max_parse_workers
+        self._init_owned()
+
+    def _init_owned(self):
+        # Executors created by us, that we need to shutdown
+        self._owned = []
+        # Shuts them down if we are garbage collected, or at exit
+        # (Python 2 has no weakref.finalize; there only at exit).
+        if hasattr(weakref, 'finalize'):
+            weakref.finalize(self, shutdown_executors, self._owned)
+        else:
+            atexit.register(shutdown_executors, self._owned)
+        # The result of get_format_config() for our process pool
+        self._parse_config = None
+        # Config passed with each task, if our pool has no initializer
+        self._task_config = None
+
+    def __repr__(self):
+        return 'ParallelLoader(io=%s,parse=%s)' % (self.io_executor,
+                                                   self.parse_executor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+
+    def __getstate__(self):
+        # Executors cannot be pickled; they are recreated when needed.
+        return dict(io_executor=None, parse_executor=None,
+                    max_io_workers=self.max_io_workers,
+                    max_parse_workers=self.max_parse_workers)
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._init_owned()
+
+    def _get_io_executor(self):
+        if self.io_executor is None:
+            self.io_executor = ThreadPoolExecutor(self.max_io_workers)
+            self._owned.append(self.io_executor)
+        return self.io_executor
+
+    def _get_parse_executor(self):
+        config = get_format_config()
+        if (self.parse_executor in self._owned and
+                config != self._parse_config):
+            # the formats were changed since the workers started
+            self._owned.remove(self.parse_executor)
+            self.parse_executor.shutdown()
+            self.parse_executor = None
+            self._task_config = None
+        if self.parse_executor is None:
+            worker_config = picklable_format_config(config)
+            if sys.version_info >= (3, 7):
+                self.parse_executor = ProcessPoolExecutor(
+                    self.max_parse_workers, initializer=init_worker,
+                    initargs=(worker_config,))
+            else:
+                # no initializer before Python 3.7
+                self.parse_executor = ProcessPoolExecutor(
+                    self.max_parse_workers)
+                self._task_config = worker_config
+            self._parse_config = config
+            self._owned.append(self.parse_executor)
+        return self.parse_executor
+
+    def shutdown(self):
+        """ Shuts down the executors that were created by this object. """
+        if self.io_executor in self._owned:
+            self.io_executor = None
+        if self.parse_executor in self._owned:
+            self.parse_executor = None
+            self._task_config = None
+        shutdown_executors(self._owned)
+
+    def load_entries_from_dir(self, dirname, pattern, skip=()):
+        """ Same as load_entries_from_dir(), but concurrent. """
+        try:
+            filenames = get_directory_index().locate_files(dirname, pattern)
+            filenames = [f for f in filenames if not f in skip]
+            for x in self.load_entries_from_files(filenames):
+                yield x
+        except:
+            logger.error('Error while loading dir %r' % friendly_path(dirname))
+            raise
+
+    def load_entries_from_files(self, filenames):
+        """ Yields (filename, counter), entry for all files, in order. """
+        if not filenames:
+            return
+        io_executor = self._get_io_executor()
+        reads = [io_executor.submit(read_file, f) for f in filenames]
+
+        cache = get_entries_cache()
+        parse_executor = self._get_parse_executor()
+        # list of (filename, data, result), where result is either
+        # the list of cached entries, a future, or the reading error
+        parsing = []
+        for filename, read in zip(filenames, reads):
+            try:
+                data = read.result()
+            except ConfToolsException as e:
+                parsing.append((filename, None, e))
+                continue
+            entries = (cache.lookup(filename, data)
+                       if cache is not None else None)
+            if entries is not None:
+                parsing.append((filename, data, entries))
+            else:
+                future = parse_executor.submit(parse_entries_partial,
+                                               filename, data,
+                                               self._task_config)
+                parsing.append((filename, data, future))
+
+        for filename, data, result in parsing:
+            if isinstance(result, Exception):
+                raise result
+            elif isinstance(result, list):
+                entries, error = result, None
+            else:
+                entries, error = result.result()
+                if error is None and cache is not None:
+                    cache.store(filename, data, entries)
+            for x in check_entries(entries):
+                yield x
+            if error is not None:
+                raise error
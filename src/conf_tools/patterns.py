@@ -1,11 +1,14 @@
+import itertools
 import re
 
-from contracts import contract
+from .utils.production import contract
 
 from .exceptions import SemanticMistake, SyntaxMistake
 
 
-__all__ = ['pattern_matches', 'recursive_subst', 'is_pattern']
+__all__ = ['pattern_matches', 'recursive_subst', 'is_pattern',
+           'CompiledTemplate', 'compile_template', 'TemplateDispatcher',
+           'SubstitutionPlan']
 
 reg = '\$\{([^\}]*)\}'
 
@@ -37,34 +40,268 @@ def pattern_matches(pattern, string):
             # -> {'id_nuisance': 'rp1', ... }
 
     """
-    # reg = '\$\{([^\}]*)\}'
-    reg = '\$\{([a-zA-Z_]\w*)\}'
-    keys = re.findall(reg, pattern)
+    return compile_template(pattern).match(string)
 
-    if not keys:
-        raise ValueError('Not a pattern: %r' % pattern)
 
-    # The ? makes the match not greedy
-    def make_pattern(match):
+# regexp for the keys in a pattern
+key_reg = '\$\{([a-zA-Z_]\w*)\}'
+
+
+class CompiledTemplate(object):
+    """ 
+        A pattern such as "r-${robot}", parsed once: it keeps the
+        names of the variables and the compiled regexp.
+    """
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.keys = re.findall(key_reg, pattern)
+        if self.keys:
+            pmatch = '\A' + re.sub(key_reg, self._key_regexp, pattern) + '\Z'
+            self.regexp = re.compile(pmatch)
+        else:
+            self.regexp = None
+
+        # The literal parts are used as they are in the regexp.
+        # If they are plain text, the score of a match is known in
+        # advance (see TemplateDispatcher).
+        literals = re.split(key_reg, pattern)[::2]
+        self.plain = (bool(self.keys) and
+                      len(set(self.keys)) == len(self.keys) and
+                      not any(c in regexp_special for c in ''.join(literals)))
+        if self.plain:
+            self.prefix = literals[0]
+            self.suffix = literals[-1]
+            self.literal_length = sum(len(x) for x in literals)
+        else:
+            self.prefix = self.suffix = ''
+            self.literal_length = None
+
+    def __repr__(self):
+        return 'CompiledTemplate(%r)' % self.pattern
+
+    @staticmethod
+    def _key_regexp(match):
         key = match.group(1)
         if 'id' in key:
             # TODO: document this
             return '([a-zA-Z]+\d*)'
         else:
+            # The ? makes the match not greedy
             return '(.+?)'
-        
-    pmatch = '\A' + re.sub(reg, make_pattern, pattern) + '\Z'
-    
-    m = re.match(pmatch, string)
-    if m is None:
-        # print('Not matched: %r %r' % (pattern, string))
-        return None
 
-    data = {}
-    for i, key in enumerate(keys):
-        data[key] = m.group(i + 1)
+    def match(self, string):
+        """ Returns a dict with the substitutions, or None. """
+        if self.regexp is None:
+            raise ValueError('Not a pattern: %r' % self.pattern)
+
+        m = self.regexp.match(string)
+        if m is None:
+            # print('Not matched: %r %r' % (pattern, string))
+            return None
+
+        return dict(zip(self.keys, m.groups()))
+
+
+# characters that have a special meaning in a regexp
+regexp_special = set('.^$*+?{}[]\\|()')
+
+
+def fits(c, key, check_prefix=True):
+    """ True if the key has the length, prefix and suffix needed by c. """
+    # each variable matches at least one character
+    return (len(key) >= c.literal_length + len(c.keys) and
+            (not check_prefix or key.startswith(c.prefix)) and
+            key.endswith(c.suffix))
+
+
+def could_tie(c1, c2):
+    """ 
+        True if some key could match both plain templates (which have
+        the same score): their prefixes and suffixes must agree.
+    """
+    return ((c1.prefix.startswith(c2.prefix) or
+             c2.prefix.startswith(c1.prefix)) and
+            (c1.suffix.endswith(c2.suffix) or
+             c2.suffix.endswith(c1.suffix)))
+
+
+class TemplateDispatcher(object):
+    """
+        Finds the template that best matches a key, with the same
+        semantics of trying all the templates: the best match is the one
+        with the shortest matched variables; two best matches are a tie.
+
+        The templates are indexed by their literal prefix, and only the
+        ones whose prefix and suffix agree with the key are tried.
+        For templates whose literal parts are plain text the score
+        is known when they are added (it is the length of the literal 
+        parts), so the candidates are tried in order of score.
+        The templates that could tie with each other (same score and
+        compatible prefix and suffix) are found when they are added,
+        so only those are checked after a match.
+    """
+
+    def __init__(self):
+        # name -> CompiledTemplate
+        self.compiled = {}
+        # name -> insertion order
+        self.order = {}
+        self.counter = 0
+        # prefix -> list of names, sorted by decreasing score
+        self.by_prefix = {}
+        # prefix length -> number of prefixes with that length
+        self.prefix_lengths = {}
+        # names of the templates that are not plain (always tried)
+        self.others = []
+        # score -> names of the plain templates with that score
+        self.by_score = {}
+        # name -> set of the plain templates that could tie with it
+        self.rivals = {}
+
+    def __len__(self):
+        return len(self.compiled)
+
+    def __contains__(self, name):
+        return name in self.compiled
+
+    def add(self, name):
+        """ Adds the template with the given pattern. """
+        if name in self.compiled:
+            self.remove(name)
+        c = compile_template(name)
+        self.compiled[name] = c
+        self.order[name] = self.counter
+        self.counter += 1
+        if not c.plain:
+            self.others.append(name)
+            return
+        bucket = self.by_prefix.setdefault(c.prefix, [])
+        if not bucket:
+            n = len(c.prefix)
+            self.prefix_lengths[n] = self.prefix_lengths.get(n, 0) + 1
+        bucket.append(name)
+        bucket.sort(key=self._rank)
+
+        rivals = self.rivals[name] = set()
+        same_score = self.by_score.setdefault(c.literal_length, [])
+        for other in same_score:
+            if could_tie(c, self.compiled[other]):
+                rivals.add(other)
+                self.rivals[other].add(name)
+        same_score.append(name)
+
+    def remove(self, name):
+        """ Removes the template, if present. """
+        c = self.compiled.pop(name, None)
+        if c is None:
+            return
+        del self.order[name]
+        if not c.plain:
+            self.others.remove(name)
+            return
+        for other in self.rivals.pop(name):
+            self.rivals[other].discard(name)
+        same_score = self.by_score[c.literal_length]
+        same_score.remove(name)
+        if not same_score:
+            del self.by_score[c.literal_length]
+        bucket = self.by_prefix[c.prefix]
+        bucket.remove(name)
+        if not bucket:
+            del self.by_prefix[c.prefix]
+            n = len(c.prefix)
+            self.prefix_lengths[n] -= 1
+            if not self.prefix_lengths[n]:
+                del self.prefix_lengths[n]
+
+    def _rank(self, name):
+        return -self.compiled[name].literal_length, self.order[name]
+
+    def candidates(self, key):
+        """ Returns the plain templates whose prefix and suffix fit key. """
+        found = []
+        for n in self.prefix_lengths:
+            for name in self.by_prefix.get(key[:n], ()):
+                if fits(self.compiled[name], key, check_prefix=False):
+                    found.append(name)
+        return found
+
+    def lookup(self, key):
+        """
+            Returns a tuple (name, matches) for the best template,
+            or (None, None). Raises ValueError if there is a tie.
+        """
+        candidates = self.candidates(key)
+        if self.others:
+            return self._lookup_all(key, candidates + self.others)
+
+        candidates.sort(key=self._rank)
+        for name in candidates:
+            matches = self.compiled[name].match(key)
+            if matches:
+                break
+        else:
+            return None, None
+
+        # Only the rivals of the best one can tie
+        ties = [name]
+        for other in self.rivals[name]:
+            c = self.compiled[other]
+            if fits(c, key) and c.match(key):
+                ties.append(other)
+        if len(ties) >= 2:
+            ties.sort(key=self.order.__getitem__)
+            self._raise_tie(key, ties)
+        return name, matches
+
+    def _lookup_all(self, key, names):
+        """ Tries all the given templates, computing the scores. """
+        possibilities = []
+        # Look for the template that can match the longer
+        for name in sorted(names, key=self.order.__getitem__):
+            matches = self.compiled[name].match(key)
+            if matches:
+                score = -sum(len(x) for x in matches.values())
+                possibilities.append((score, name, matches))
+
+        # no matches
+        if not possibilities:
+            return None, None
+
+        # sort by score
+        possibilities.sort(key=lambda p: (-p[0]))
+
+        # Check if there is a tie
+        best = possibilities[0][0]
+        ties = [p[1] for p in possibilities if p[0] == best]
+        if len(ties) >= 2:
+            self._raise_tie(key, ties)
+
+        return possibilities[0][1], possibilities[0][2]
+
+    def _raise_tie(self, key, ties):
+        msg = ('Detected a tie. Key %r matches with same score: %r' %
+               (key, ties))
+        raise ValueError(msg)
+
+
+class CompiledTemplatesGlobal(object):
+    # pattern -> CompiledTemplate
+    cache = {}
+    # The cache is cleared when it grows beyond this size
+    max_size = 1000
 
-    return data
+
+def compile_template(pattern):
+    """ Returns the (cached) CompiledTemplate for the pattern. """
+    cache = CompiledTemplatesGlobal.cache
+    compiled = cache.get(pattern, None)
+    if compiled is None:
+        if len(cache) >= CompiledTemplatesGlobal.max_size:
+            cache.clear()
+        compiled = cache[pattern] = CompiledTemplate(pattern)
+    return compiled
 
 
 def recursive_subst(template, **matches):
@@ -84,6 +321,106 @@ def recursive_subst(template, **matches):
         return template
 
 
+class SubstitutionPlan(object):
+    """
+        A template compiled for recursive_subst(): the strings without
+        variables are already stripped and converted with trynum(), and
+        the option tables are already parsed.
+
+        apply(matches) gives the same result as
+        recursive_subst(template, **matches), except that the parts
+        without variables are shared between the results: they must
+        be copied before being modified.
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.static, self.value = compile_subst(template)
+
+    def __repr__(self):
+        return 'SubstitutionPlan(%r)' % self.template
+
+    def apply(self, matches):
+        if self.static:
+            return self.value
+        return self.value(matches)
+
+
+def compile_subst(template):
+    """
+        Returns a tuple (True, value) if the template has no variables,
+        or (False, function) where function(matches) gives the value.
+    """
+    if isinstance(template, str):
+        if not re.search(reg, template):
+            return True, trynum(template.strip())
+        return False, compile_string(template)
+    elif isinstance(template, list):
+        compiled = [compile_subst(x) for x in template]
+        if all(static for static, _ in compiled):
+            return True, [x for _, x in compiled]
+
+        def apply_list(matches):
+            return [x if static else x(matches) for static, x in compiled]
+        return False, apply_list
+    elif isinstance(template, dict):
+        compiled = [(k,) + compile_subst(v) for k, v in template.items()]
+        if all(static for _, static, _ in compiled):
+            return True, dict((k, x) for k, _, x in compiled)
+
+        def apply_dict(matches):
+            return dict((k, x if static else x(matches))
+                        for k, static, x in compiled)
+        return False, apply_dict
+    else:
+        return True, template
+
+
+def compile_string(template):
+    """ Compiles a string with variables (see substitute_strings()). """
+    parts = re.split(reg, template)
+    # literals in the even positions, variables in the odd ones
+    pieces = []
+    for i, part in enumerate(parts):
+        if i % 2 == 0:
+            pieces.append((None, part, None))
+        elif not '|' in part:
+            pieces.append((part, None, None))
+        else:
+            first = part.index('|')
+            expr = part[first + 1:]
+            try:
+                options = parse_options(expr)
+            except SyntaxMistake:
+                # raise it when applied, as substitute_strings() does
+                options = None
+            pieces.append((part[:first], expr, options))
+
+    def apply_string(matches):
+        s = []
+        for key, expr, options in pieces:
+            if key is None:
+                s.append(expr)
+                continue
+            if not key in matches:
+                msg = 'Key %r not found (know %s)' % (key, matches.keys())
+                raise SemanticMistake(msg)
+            if expr is None:
+                s.append(matches[key])
+                continue
+            value = trynum(matches[key])
+            if options is None:
+                parse_options(expr)
+            if not value in options:
+                msg = ('Could not find value %r in options %s given for %r' %
+                       (value, options.keys(), key))
+                raise SemanticMistake(msg)
+            s.append(str(options[value]))
+        return trynum(''.join(s).strip())
+
+    return apply_string
+
+
 @contract(template='str', matches='dict(str:str)', returns='str')
 def substitute_strings(template, matches):
     """
@@ -159,3 +496,67 @@ def parse_options(expr):
 
     return options
 
+
+
+def template_domains(template):
+    """
+        Returns a dict variable -> list of values, for the variables
+        that are used with an option table (as in "${size|small=1;big=2}")
+        somewhere in the template. If a variable is used with more
+        than one table, only the values in all of them are kept.
+    """
+    domains = {}
+
+    def visit(x):
+        if isinstance(x, str):
+            for s in re.findall(reg, x):
+                if not '|' in s:
+                    continue
+                first = s.index('|')
+                key = s[:first]
+                values = option_values(s[first + 1:])
+                if key in domains:
+                    values = [v for v in domains[key] if v in values]
+                domains[key] = values
+        elif isinstance(x, list):
+            for y in x:
+                visit(y)
+        elif isinstance(x, dict):
+            for y in x.values():
+                visit(y)
+
+    visit(template)
+    return domains
+
+
+def option_values(expr):
+    """ Returns the values (as strings) in an option table "a=1;b=2". """
+    parse_options(expr)  # raises SyntaxMistake if invalid
+    return [pair.split('=')[0].strip() for pair in expr.split(';')]
+
+
+def enumerate_pattern(pattern, domains):
+    """
+        Yields (id, matches) for all the ids obtained by giving to
+        the variables of the pattern the values in domains, without
+        building all the combinations at once. Only the ids that are
+        matched by the pattern with the same values are returned.
+
+        Raises ValueError if a variable has no domain.
+    """
+    compiled = compile_template(pattern)
+    keys = []
+    for k in compiled.keys:
+        if not k in keys:
+            keys.append(k)
+    missing = [k for k in keys if not k in domains]
+    if missing:
+        msg = 'No domain for the variables %s of %r.' % (missing, pattern)
+        raise ValueError(msg)
+
+    parts = re.split(key_reg, pattern)
+    for values in itertools.product(*[domains[k] for k in keys]):
+        matches = dict(zip(keys, values))
+        s = ''.join(matches[p] if i % 2 else p for i, p in enumerate(parts))
+        if compiled.match(s) == matches:
+            yield s, matches
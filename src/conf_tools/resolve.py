@@ -0,0 +1,257 @@
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from .code_specs import instantiate_spec_error
+from .exceptions import ConfToolsException, SemanticMistake, describe_error
+from .instance_cache import spec_fingerprint
+from .instantiate_utils import instantiate
+
+__all__ = [
+    'CodeGraph',
+    'REF_FIELD',
+    'instantiate_spec_resolved',
+]
+
+# A parameter {'$ref': 'id'} or {'$ref': 'spec:id'} is replaced by
+# the object with that ID (in the same spec, or in the given one).
+REF_FIELD = '$ref'
+
+
+def is_ref(x):
+    return isinstance(x, dict) and len(x) == 1 and REF_FIELD in x
+
+
+def is_code_spec(x):
+    return (isinstance(x, list) and len(x) == 2 and
+            isinstance(x[0], str) and isinstance(x[1], dict))
+
+
+class Dep(object):
+    """ Placeholder for the object built by another node. """
+
+    def __init__(self, key):
+        self.key = key
+
+
+def substitute_deps(x, results):
+    if isinstance(x, Dep):
+        return results[x.key]
+    if isinstance(x, dict):
+        return dict((k, substitute_deps(v, results)) for k, v in x.items())
+    if isinstance(x, list):
+        return [substitute_deps(v, results) for v in x]
+    return x
+
+
+class Node(object):
+
+    def __init__(self, key, what, deps, build):
+        """
+            :param what: Description, for the error messages.
+            :param deps: Keys of the nodes needed.
+            :param build: Function that takes the dict key -> object
+                for the deps and returns the object.
+        """
+        self.key = key
+        self.what = what
+        self.deps = deps
+        self.build = build
+
+
+class CodeGraph(object):
+    """
+        Dependency graph of the objects needed to instance a code spec
+        whose parameters contain other code specs (lists [name, params])
+        and references to the entries of the ConfigMaster
+        ({'$ref': 'spec:id'}).
+
+        Identical code specs and references to the same entry are built
+        only once and shared. Cycles among the references are detected
+        when building the graph.
+        The nodes whose dependencies are ready are built concurrently.
+
+        Usage: ..
+
+            graph = CodeGraph(master)
+            root = graph.add_code(code_spec)
+            ob = graph.run(root)
+
+    """
+
+    def __init__(self, master=None):
+        self.master = master
+        # key -> Node, in topological order
+        self.nodes = OrderedDict()
+
+    def add_ref(self, ref, spec_name=None, stack=()):
+        """ Adds the node for the reference "id" or "spec:id". """
+        spec_name, id_object = self._parse_ref(ref, spec_name)
+        key = ('ref', spec_name, id_object)
+        if key in stack:
+            cycle = [k for k in stack if k[0] == 'ref']
+            cycle = cycle[cycle.index(key):] + [key]
+            msg = ('Cycle in the references: %s.' %
+                   ' -> '.join('%s:%s' % k[1:] for k in cycle))
+            raise SemanticMistake(msg)
+        if key in self.nodes:
+            return key
+
+        spec = self.master.specs[spec_name]
+        entry = spec[id_object]
+        stack = tuple(stack) + (key,)
+        code = entry.get('code', None)
+        deps = []
+        if is_code_spec(code):
+            params = dict((k, self._walk(v, spec_name, stack, deps))
+                          for k, v in code[1].items())
+        else:
+            params = None
+
+        def build(results):
+            # The entry is built by the spec, as instance() does, 
+            # with the parameters already built.
+            resolved = None
+            if params is not None:
+                resolved = dict(entry)
+                resolved['code'] = [code[0], substitute_deps(params, results)]
+            value = spec._instance_cached(id_object, entry, resolved)
+            if spec.object_check is not None:
+                try:
+                    spec.object_check(value)
+                except Exception as e:
+                    raise spec._instance_error(id_object, describe_error(e))
+            return value
+
+        self.nodes[key] = Node(key, '%s:%s' % (spec_name, id_object),
+                               deps, build)
+        return key
+
+    def add_code(self, code_spec, spec_name=None, stack=()):
+        """ Adds the node for the code spec and the ones it needs. """
+        key = ('code', spec_name, spec_fingerprint(code_spec))
+        if key in self.nodes:
+            return key
+        stack = tuple(stack) + (key,)
+        deps = []
+        function_name = code_spec[0]
+        params = dict((k, self._walk(v, spec_name, stack, deps))
+                      for k, v in code_spec[1].items())
+
+        def build(results):
+            try:
+                return instantiate(function_name,
+                                   substitute_deps(params, results))
+            except Exception as e:
+                raise instantiate_spec_error(code_spec, e)
+
+        self.nodes[key] = Node(key, function_name, deps, build)
+        return key
+
+    def _walk(self, x, spec_name, stack, deps):
+        """ Replaces the code specs and references in x with Dep. """
+        if is_ref(x):
+            key = self.add_ref(x[REF_FIELD], spec_name, stack)
+        elif is_code_spec(x):
+            key = self.add_code(x, spec_name, stack)
+        elif isinstance(x, dict):
+            return dict((k, self._walk(v, spec_name, stack, deps))
+                        for k, v in x.items())
+        elif isinstance(x, list):
+            return [self._walk(v, spec_name, stack, deps) for v in x]
+        else:
+            return x
+        if not key in deps:
+            deps.append(key)
+        return Dep(key)
+
+    def _parse_ref(self, ref, spec_name):
+        if not isinstance(ref, str):
+            raise SemanticMistake('Invalid reference %r.' % ref)
+        if self.master is None:
+            msg = 'Cannot resolve the reference %r without a master.' % ref
+            raise SemanticMistake(msg)
+        if ':' in ref:
+            prefix, id_object = ref.split(':', 1)
+            if prefix in self.master.specs:
+                return prefix, id_object
+        if spec_name is None:
+            msg = 'The reference %r must be of the form "spec:id".' % ref
+            raise SemanticMistake(msg)
+        return spec_name, ref
+
+    def run(self, root, executor=None, max_workers=8):
+        """
+            Builds all the nodes needed for the root and returns its
+            object. The executor must be able to run closures (e.g. a
+            ThreadPoolExecutor, which is created if not given).
+        """
+        own_executor = executor is None
+        if own_executor:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            return self._run(root, executor)
+        finally:
+            if own_executor:
+                executor.shutdown()
+
+    def _run(self, root, executor):
+        needed = self._needed(root)
+        missing = dict((k, set(self.nodes[k].deps)) for k in needed)
+        dependents = dict((k, []) for k in needed)
+        for k in needed:
+            for d in self.nodes[k].deps:
+                dependents[d].append(k)
+        results = {}
+        running = {}
+
+        def submit(k):
+            node = self.nodes[k]
+            args = dict((d, results[d]) for d in node.deps)
+            running[executor.submit(node.build, args)] = k
+
+        for k in needed:
+            if not missing[k]:
+                submit(k)
+        while running:
+            done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in done:
+                k = running.pop(future)
+                try:
+                    results[k] = future.result()
+                except ConfToolsException:
+                    for f in running:
+                        f.cancel()
+                    raise
+                except Exception as e:
+                    for f in running:
+                        f.cancel()
+                    msg = 'Error while building %s: %s' % (
+                        self.nodes[k].what, e)
+                    raise ConfToolsException(msg)
+                for d in dependents[k]:
+                    missing[d].discard(k)
+                    if not missing[d]:
+                        submit(d)
+        return results[root]
+
+    def _needed(self, root):
+        """ Returns the keys of the nodes needed to build root. """
+        needed = set()
+        todo = [root]
+        while todo:
+            k = todo.pop()
+            if not k in needed:
+                needed.add(k)
+                todo.extend(self.nodes[k].deps)
+        return needed
+
+
+def instantiate_spec_resolved(code_spec, master=None, spec_name=None,
+                              executor=None):
+    """
+        Like instantiate_spec(), but the code specs and the
+        references in the parameters are built first (see CodeGraph).
+    """
+    graph = CodeGraph(master)
+    root = graph.add_code(code_spec, spec_name)
+    return graph.run(root, executor)
@@ -1,6 +1,7 @@
 import os
 
-from contracts import contract, describe_type
+from contracts import describe_type
+from .utils.production import contract
 
 from conf_tools import logger
 
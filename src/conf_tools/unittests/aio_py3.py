@@ -0,0 +1,59 @@
+# The tests of aio.py, which need Python 3 (run by aio_test.py).
+import asyncio
+import pickle
+import threading
+import time
+
+from conf_tools import ConfigMaster
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': """
+- id: a
+  desc: thing
+  code: [c, {x: 1}]
+- id: "t-${n}"
+  desc: template
+  code: [c, {x: "${n}"}]
+""",
+}
+
+created = []
+
+
+def make_thing(spec):
+    created.append(spec['id'])
+    time.sleep(0.05)
+    return dict(x=spec['code'][1]['x'], thread=threading.current_thread())
+
+
+def run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def check_ainstance():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('aio')
+        things = master.add_class('things', '*.things.yaml',
+                                  instance=make_thing)
+        del created[:]
+
+        async def go():
+            await master.aload(dirname)
+            assert not things.dirs_to_read
+            return await asyncio.gather(things.ainstance('a'),
+                                        things.ainstance('a'),
+                                        things.ainstance('t-2'))
+
+        a1, a2, t2 = run(go())
+        assert a1 is a2 and t2['x'] == 2
+        assert sorted(created) == ['a', 't-2']
+        assert a1['thread'] is not threading.current_thread()
+
+        # the state of asyncio is not pickled
+        pickle.dumps(master)
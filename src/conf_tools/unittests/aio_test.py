@@ -0,0 +1,9 @@
+from nose.plugins.skip import SkipTest
+import six
+
+
+def test_ainstance():
+    if not six.PY3:
+        raise SkipTest('The awaitable methods need Python 3.')
+    from conf_tools.unittests.aio_py3 import check_ainstance
+    check_ainstance()
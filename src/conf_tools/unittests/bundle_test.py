@@ -0,0 +1,59 @@
+import os
+
+from conf_tools.unittests.utils import (count_file_reads,
+    create_test_environment, new_master, write_file)
+
+
+config = {
+    'a.robots.yaml': '- id: r1\n  desc: robot\n  code: [c, {x: 1}]\n',
+    'b.robots.yaml': """
+- id: "r-${n}"
+  desc: template
+  code: [c, {x: "${n}"}]
+- id: r-2
+  desc: from template
+""",
+    'a.worlds.yaml': '- id: w1\n  desc: world\n  code: c\n',
+}
+
+
+CLASSES = ['robots', 'worlds']
+
+
+def test_bundle():
+    with count_file_reads() as parsed, \
+            create_test_environment(config) as dirname:
+        bundle = os.path.join(dirname, 'out', 'config.bundle')
+
+        master = new_master(dirname, CLASSES)
+        assert not master.load_bundle(bundle)
+        assert len(parsed) == 3
+
+        del parsed[:]
+        master = new_master(dirname, CLASSES)
+        assert master.load_bundle(bundle)
+        assert not parsed
+        assert sorted(master.robots) == ['r-2', 'r1']
+        assert master.robots['r-5']['code'][1]['x'] == 5
+        assert master.robots.entry2file['r1'] == \
+            os.path.join(os.path.realpath(dirname), 'a.robots.yaml')
+        assert list(master.worlds) == ['w1']
+        assert not parsed
+
+        # a new file makes the bundle out of date
+        write_file(dirname, 'b.worlds.yaml',
+                   '- id: w2\n  desc: world\n  code: c\n')
+        master = new_master(dirname, CLASSES)
+        assert not master.load_bundle(bundle)
+        assert sorted(master.worlds) == ['w1', 'w2']
+
+        # so does a modified file
+        write_file(dirname, 'b.worlds.yaml',
+                   '- id: w3\n  desc: world\n  code: c\n')
+        master = new_master(dirname, CLASSES)
+        assert not master.load_bundle(bundle, rebuild=False)
+        assert sorted(master.worlds) == ['w1', 'w3']
+
+        # different directories
+        master = new_master(None, CLASSES)
+        assert not master.load_bundle(bundle, rebuild=False)
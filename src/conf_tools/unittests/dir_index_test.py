@@ -0,0 +1,38 @@
+import os
+
+from conf_tools import ConfigMaster, GlobalConfig
+from conf_tools.unittests.utils import create_test_environment
+from conf_tools.utils import get_directory_index
+
+
+config = {
+    'a.robots.yaml': '- id: r1\n  desc: robot\n  code: c\n',
+    'a.worlds.yaml': '- id: w1\n  desc: world\n  code: c\n',
+    'a.agents.yaml': '- id: g1\n  desc: agent\n  code: c\n',
+}
+
+
+def test_directory_walked_once():
+    with create_test_environment(config) as dirname:
+        masters = []
+        for name in ['m1', 'm2']:
+            master = ConfigMaster(name)
+            for kind in ['robots', 'worlds', 'agents']:
+                master.add_class(kind, '*.%s.yaml' % kind)
+            masters.append(master)
+        GlobalConfig.global_load_dir(dirname)
+
+        index = get_directory_index()
+        walks = index.walks
+        for master in masters:
+            assert list(master.robots) == ['r1']
+            assert list(master.worlds) == ['w1']
+            assert list(master.agents) == ['g1']
+        assert index.walks == walks + 1
+
+        with open(os.path.join(dirname, 'b.robots.yaml'), 'w') as f:
+            f.write('- id: r2\n  desc: robot\n  code: c\n')
+        robots = masters[0].robots
+        robots.force_load(dirname)
+        assert sorted(robots) == ['r1', 'r2']
+        assert index.walks == walks + 2
@@ -0,0 +1,81 @@
+import os
+import tempfile
+
+from conf_tools import (ConfigMaster, GlobalConfig, get_entries_cache,
+    set_entries_cache_dir)
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': """
+- id: a1
+  desc: first
+  code: c
+- id: a2
+  desc: second
+  code: c
+""",
+    'b.things.yaml': """
+- id: b1
+  desc: third
+  code: c
+""",
+}
+
+
+def load_things(dirname):
+    GlobalConfig.clear_for_tests()
+    master = ConfigMaster('cache')
+    master.add_class('things', '*.things.yaml')
+    master.load(dirname)
+    return dict((k, master.things[k]) for k in master.things)
+
+
+def test_entries_cache():
+    set_entries_cache_dir(tempfile.mkdtemp())
+    try:
+        cache = get_entries_cache()
+        with create_test_environment(config) as dirname:
+            first = load_things(dirname)
+            assert (cache.hits, cache.misses) == (0, 2)
+
+            second = load_things(dirname)
+            assert first == second
+            assert (cache.hits, cache.misses) == (2, 2)
+
+            with open(os.path.join(dirname, 'b.things.yaml'), 'w') as f:
+                f.write('- id: b2\n  desc: changed\n  code: c\n')
+            third = load_things(dirname)
+            assert sorted(third) == ['a1', 'a2', 'b2']
+            assert (cache.hits, cache.misses) == (3, 3)
+
+            os.unlink(os.path.join(dirname, 'a.things.yaml'))
+            assert cache.prune() == 1
+
+            cache.invalidate()
+            load_things(dirname)
+            assert cache.misses == 4
+    finally:
+        set_entries_cache_dir(None)
+
+
+def test_entries_cache_environment():
+    # The special fields are resolved after the lookup in the cache.
+    files = {'a.things.yaml': '- id: a\n  desc: d\n  code: c\n'
+                              '  file:data: ${DATADIR}/x.pkl\n'}
+    previous = os.environ.get('DATADIR', None)
+    set_entries_cache_dir(tempfile.mkdtemp())
+    try:
+        cache = get_entries_cache()
+        with create_test_environment(files) as dirname:
+            os.environ['DATADIR'] = '/srv/one'
+            assert load_things(dirname)['a']['data'] == '/srv/one/x.pkl'
+            os.environ['DATADIR'] = '/srv/two'
+            assert load_things(dirname)['a']['data'] == '/srv/two/x.pkl'
+            assert cache.hits == 1
+    finally:
+        set_entries_cache_dir(None)
+        if previous is None:
+            del os.environ['DATADIR']
+        else:
+            os.environ['DATADIR'] = previous
@@ -0,0 +1,82 @@
+import json
+import os
+
+from conf_tools import (ConfigMaster, SemanticMistake, SyntaxMistake,
+    format_patterns)
+from conf_tools.formats import load_json_lines
+from conf_tools.load_entries import load_entries_from_file
+from conf_tools.unittests.utils import create_test_environment
+
+
+entries = [dict(id='a', desc='An entry', code=['module.Class', {'x': 1}]),
+           dict(id='b', desc='Another', code=['module.Class', {}])]
+
+config = {
+    'e.yaml': """
+- id: a
+  desc: An entry
+  code: [module.Class, {x: 1}]
+- id: b
+  desc: Another
+  code: [module.Class, {}]
+""",
+    'e.json': json.dumps(entries),
+    'e.jsonl': '\n'.join(json.dumps(x) for x in entries) + '\n',
+    'blank.jsonl': '\n' + '\n  \n'.join(json.dumps(x) for x in entries),
+    'badline.jsonl': '{"id": "a"}\n\n{"id": \n',
+    'bad.json': '[{"id": "a",',
+    'bad.jsonl': '{"id": "a"}\n[1, 2]\n',
+    'noid.jsonl': '{"desc": "no id"}\n',
+    'dict.json': '{"id": "a"}',
+    'empty.json': '',
+}
+
+
+def load(dirname, name):
+    filename = os.path.join(dirname, name)
+    return [x for _, x in load_entries_from_file(filename)]
+
+
+def expect(exception, dirname, name):
+    try:
+        load(dirname, name)
+    except exception as e:
+        return str(e)
+    raise Exception('Expected %s for %s.' % (exception.__name__, name))
+
+
+def test_formats():
+    with create_test_environment(config) as dirname:
+        assert load(dirname, 'e.yaml') == entries
+        assert load(dirname, 'e.json') == entries
+        assert load(dirname, 'e.jsonl') == entries
+        assert load(dirname, 'blank.jsonl') == entries
+        assert load(dirname, 'empty.json') == []
+
+        assert 'Cannot parse JSON' in expect(SyntaxMistake, dirname, 'bad.json')
+        assert 'list of dicts' in expect(SyntaxMistake, dirname, 'bad.jsonl')
+        msg = expect(SyntaxMistake, dirname, 'badline.jsonl')
+        assert 'line 3' in msg and 'badline.jsonl' in msg, msg
+        assert 'list of dicts' in expect(SyntaxMistake, dirname, 'dict.json')
+        expect(SemanticMistake, dirname, 'noid.jsonl')
+
+
+def test_format_patterns():
+    with create_test_environment({'a.things.yaml': config['e.yaml'],
+                                  'b.things.jsonl': '{"id": "c", "code": 1}\n'
+                                  }) as dirname:
+        master = ConfigMaster('formats')
+        master.add_class('things', format_patterns('*.things'))
+        master.load(dirname)
+        assert sorted(master.things) == ['a', 'b', 'c']
+
+
+def test_json_lines_streaming():
+    # The file is parsed while being read, one line at a time
+    with create_test_environment(config) as dirname:
+        filename = os.path.join(dirname, 'e.jsonl')
+        with open(filename, 'rb') as f:
+            parsed = load_json_lines(filename, f)
+            assert next(parsed) == entries[0]
+            assert f.tell() < os.path.getsize(filename)
+            assert list(parsed) == entries[1:]
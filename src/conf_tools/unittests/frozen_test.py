@@ -0,0 +1,75 @@
+from copy import deepcopy
+import pickle
+
+import yaml
+
+from conf_tools import ConfigMaster
+from conf_tools.objspec import ObjectSpec
+from conf_tools.unittests.utils import create_test_environment
+from conf_tools.utils import FrozenDict, freeze, thaw
+
+
+config = {
+    'a.things.yaml': """
+- id: a
+  desc: An entry
+  code: [module.Class, {l: [1, 2], d: {x: 1}}]
+- id: "t-${n}"
+  desc: template
+  code: [c, {n: "${n}", l: [1, 2]}]
+"""
+}
+
+
+def expect_read_only(f):
+    try:
+        f()
+    except TypeError:
+        return
+    raise Exception('Expected TypeError.')
+
+
+def test_freeze():
+    x = {'a': [1, {'b': 2}], 'c': 'x'}
+    f = freeze(x)
+    assert f == x
+    assert isinstance(f, dict) and isinstance(f['a'], list)
+    assert freeze(f) is f
+    expect_read_only(lambda: f.__setitem__('c', 1))
+    expect_read_only(lambda: f['a'].append(3))
+    expect_read_only(lambda: f['a'][1].update({'b': 3}))
+
+    assert pickle.loads(pickle.dumps(f)) == x
+    assert isinstance(deepcopy(f), FrozenDict)
+    assert yaml.safe_load(yaml.safe_dump(f)) == x
+
+    t = thaw(f)
+    assert t == x and type(t) is dict and type(t['a'][1]) is dict
+    t['a'].append(3)
+    assert f['a'] == [1, {'b': 2}]
+
+
+def test_read_only_mode():
+    previous = ObjectSpec.read_only
+    ObjectSpec.read_only = True
+    try:
+        with create_test_environment(config) as dirname:
+            master = ConfigMaster('frozen')
+            things = master.add_class('things', '*.things.yaml')
+            master.load(dirname)
+
+            a = things['a']
+            assert things['a'] is a
+            assert a['code'][1]['d'] == {'x': 1}
+            expect_read_only(lambda: a['code'][1]['l'].append(3))
+
+            t = things['t-1']
+            assert things['t-1'] is t
+            expect_read_only(lambda: t.__setitem__('desc', 'changed'))
+
+            m = things.get_mutable('a')
+            m['code'][1]['l'].append(3)
+            assert things['a']['code'][1]['l'] == [1, 2]
+            assert things.get_mutable('t-1')['code'][1]['n'] == 1
+    finally:
+        ObjectSpec.read_only = previous
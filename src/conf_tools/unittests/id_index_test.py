@@ -0,0 +1,62 @@
+import os
+import tempfile
+
+from conf_tools import get_id_index, set_entries_cache_dir
+from conf_tools.unittests.utils import (count_file_reads,
+    create_test_environment, new_master, write_file)
+
+
+config = {
+    'a.robots.yaml': '- id: r1\n  desc: robot\n  code: [c, {x: 1}]\n',
+    'b.robots.yaml': """
+- id: "r-${n}"
+  desc: template
+  code: [c, {x: "${n}"}]
+""",
+    'c.robots.yaml': '- id: r3\n  desc: robot\n  code: c\n',
+    'd.robots.yaml': '- id: r-4\n  desc: from template\n',
+}
+
+
+def basenames(filenames):
+    return [os.path.basename(f) for f in filenames]
+
+
+def test_id_index():
+    set_entries_cache_dir(tempfile.mkdtemp())
+    try:
+        id_index = get_id_index()
+        with count_file_reads() as parsed, \
+                create_test_environment(config) as dirname:
+            # The first time everything is read, and the index built.
+            master = new_master(dirname)
+            assert master.robots['r1']['code'][1]['x'] == 1
+            assert len(parsed) == 4
+            assert id_index.misses == 1
+
+            # Now only the needed files are read
+            del parsed[:]
+            master = new_master(dirname)
+            assert master.robots['r1']['code'][1]['x'] == 1
+            assert basenames(parsed) == ['a.robots.yaml', 'b.robots.yaml']
+            assert master.robots['r-5']['code'][1]['x'] == 5
+            assert 'r-4' in master.robots
+            assert master.robots['r-4']['desc'] == 'from template'
+            assert not 'r9' in master.robots
+            assert id_index.hits == 1
+            assert len(parsed) == 3, parsed
+
+            # Iterating reads the rest
+            assert sorted(master.robots) == ['r-4', 'r1', 'r3']
+            assert len(parsed) == 4, parsed
+
+            # If a file changes, the index is not used.
+            write_file(dirname, 'c.robots.yaml',
+                       '- id: r5\n  desc: robot\n  code: c\n')
+            del parsed[:]
+            master = new_master(dirname)
+            assert 'r5' in master.robots
+            assert len(parsed) == 4
+            assert id_index.misses == 2
+    finally:
+        set_entries_cache_dir(None)
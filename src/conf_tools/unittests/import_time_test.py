@@ -0,0 +1,45 @@
+import os
+import subprocess
+import sys
+
+from nose.plugins.skip import SkipTest
+
+import conf_tools
+
+# The import time itself is checked by benchmarks/import_bench.py.
+script = """
+import sys
+import conf_tools
+heavy = ['yaml', 'contracts', 'conf_tools.utils', 'conf_tools.master',
+         'conf_tools.objspec']
+print(' '.join(m for m in heavy if m in sys.modules))
+"""
+
+
+def test_import_is_lazy():
+    if sys.version_info < (3, 7):
+        raise SkipTest('Needs the module __getattr__ of Python 3.7.')
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    out = subprocess.check_output([sys.executable, '-c', script], env=env)
+    imported = out.decode().strip()
+    assert imported == '', imported
+
+
+def test_lazy_names():
+    for module, names in conf_tools._lazy_names.items():
+        m = getattr(conf_tools, module)
+        for name in names:
+            assert getattr(conf_tools, name) is getattr(m, name)
+    for name in conf_tools._other_names:
+        getattr(conf_tools, name)
+    from contracts import describe_value
+    assert conf_tools.describe_value is describe_value
+    assert conf_tools.YAMLError is conf_tools.yaml.YAMLError
+    assert 'ConfigMaster' in dir(conf_tools)
+    try:
+        conf_tools.not_existing
+    except AttributeError:
+        pass
+    else:
+        raise Exception('Expected AttributeError.')
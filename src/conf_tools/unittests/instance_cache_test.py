@@ -0,0 +1,110 @@
+import gc
+import os
+import pickle
+import threading
+import time
+
+from conf_tools import ConfigMaster, InstanceCache
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': '- id: a\n  desc: thing\n  code: [c, {x: 1}]\n',
+}
+
+
+class Thing(object):
+
+    def __init__(self, spec):
+        self.spec = spec
+
+
+created = []
+
+
+def make_thing(spec):
+    created.append(spec['id'])
+    return Thing(spec)
+
+
+def test_instance_cache():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('instances')
+        things = master.add_class('things', '*.things.yaml',
+                                  instance=make_thing)
+        master.load(dirname)
+        cache = things.enable_instance_cache('lru', max_size=10)
+        del created[:]
+
+        a = things.instance('a')
+        assert things.instance('a') is a
+        assert created == ['a']
+        assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+
+        # invalidated when the entry is reloaded
+        filename = os.path.join(dirname, 'a.things.yaml')
+        with open(filename, 'w') as f:
+            f.write('- id: a\n  desc: thing\n  code: [c, {x: 2}]\n')
+        t = time.time() + 10
+        os.utime(filename, (t, t))
+        things.reload_changed()
+        a2 = things.instance('a')
+        assert a2 is not a and a2.spec['code'][1]['x'] == 2
+
+        # the master can still be pickled, without the objects
+        master2 = pickle.loads(pickle.dumps(master))
+        cache2 = master2.things.instance_cache
+        assert cache2.policy == 'lru' and len(cache2) == 0
+        assert master2.things.instance('a').spec['code'][1]['x'] == 2
+
+
+def test_policies():
+    n = []
+
+    def create():
+        n.append(1)
+        return Thing(None)
+
+    lru = InstanceCache('lru', max_size=2)
+    for key in ['a', 'b', 'a', 'c', 'b']:
+        lru.get(key, 'fp', create)
+    # 'b' was evicted by 'c'
+    assert len(n) == 4 and list(lru._values) == ['c', 'b']
+    # a different fingerprint is a miss
+    lru.get('b', 'fp2', create)
+    assert len(n) == 5
+
+    weak = InstanceCache('weak')
+    x = weak.get('a', 'fp', create)
+    assert weak.get('a', 'fp', create) is x
+    del x
+    gc.collect()
+    assert len(weak) == 0
+
+    ttl = InstanceCache('ttl', ttl=0.01)
+    x = ttl.get('a', 'fp', create)
+    assert ttl.get('a', 'fp', create) is x
+    time.sleep(0.02)
+    assert ttl.get('a', 'fp', create) is not x
+
+
+def test_concurrent_first_access():
+    cache = InstanceCache('lru')
+    n = []
+
+    def create():
+        n.append(1)
+        time.sleep(0.05)
+        return Thing(None)
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(cache.get('a', 'fp', create)))
+        for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(n) == 1
+    assert all(r is results[0] for r in results)
+    assert cache.misses == 1 and cache.hits == 7
@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from conf_tools import ConfigMaster, InstanceManyError
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': """
+- id: a
+  desc: thing
+  code: [c, {x: 1}]
+- id: b
+  desc: thing
+  code: [c, {x: 2}]
+- id: bad
+  desc: thing
+  code: [c, {x: -1}]
+- id: "t-${n}"
+  desc: template
+  code: [c, {x: "${n}"}]
+""",
+}
+
+
+def make_thing(spec):
+    x = spec['code'][1]['x']
+    if x < 0:
+        raise ValueError('negative x')
+    return dict(id=spec['id'], x=x)
+
+
+checked = []
+
+
+def check_thing(spec):
+    checked.append(spec['id'])
+
+
+def load(dirname):
+    master = ConfigMaster('many')
+    things = master.add_class('things', '*.things.yaml', check=check_thing,
+                              instance=make_thing)
+    master.load(dirname)
+    return things
+
+
+def test_instance_many():
+    with create_test_environment(config) as dirname:
+        things = load(dirname)
+        del checked[:]
+        res = things.instance_many(['b', 't-3', 'a', 'b'])
+        assert [r['x'] for r in res] == [2, 3, 1, 2]
+        assert res[0] is res[3]
+        assert sorted(checked) == ['a', 'b', 't-3']
+
+        with ProcessPoolExecutor(2) as executor:
+            res = things.instance_many(['a', 't-4'], executor=executor)
+        assert res == [dict(id='a', x=1), dict(id='t-4', x=4)]
+
+
+def test_instance_many_errors():
+    with create_test_environment(config) as dirname:
+        things = load(dirname)
+        try:
+            things.instance_many(['a', 'bad', 'missing'])
+        except InstanceManyError as e:
+            assert list(e.errors) == ['bad', 'missing']
+            assert list(e.results) == ['a']
+            msg = str(e.errors['bad'])
+            assert msg.startswith("Could not instance the object 'bad'")
+            assert 'negative x' in msg
+        else:
+            raise Exception('Expected InstanceManyError.')
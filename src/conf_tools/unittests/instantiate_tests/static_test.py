@@ -35,3 +35,22 @@ def test_second():
     else:
         msg = 'Expected ValueError'
         raise Exception(msg)
+
+
+def test_resolved_cache():
+    from conf_tools.instantiate_utils import (HAS_FIND_SPEC,
+        ImportNameGlobal, resolve_name)
+    name = 'conf_tools.unittests.instantiate_tests.static_test.MyStatic.f'
+    ImportNameGlobal.resolved.pop(name, None)
+    f = import_name(name)
+    assert ImportNameGlobal.resolved[name] is f
+    assert import_name(name)(2) == 3
+    if not HAS_FIND_SPEC:
+        return  # resolve_name() is not used on Python 2
+    # also submodules not imported yet, and plain modules
+    assert resolve_name('xml.dom.minidom.parseString') is not None
+    assert resolve_name('os.path') is import_name('os.path')
+    # misses are not cached
+    assert resolve_name('conf_tools.a') is None
+    assert resolve_name('not_existing.a') is None
+    assert not 'conf_tools.a' in ImportNameGlobal.resolved
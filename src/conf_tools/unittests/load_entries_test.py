@@ -0,0 +1,84 @@
+import logging
+import os
+
+from conf_tools import ConfToolsGlobal, SyntaxMistake, formats
+from conf_tools.load_entries import load_entries_from_file
+from conf_tools.unittests.utils import create_test_environment
+
+
+good = """
+- id: a
+  desc: An entry
+  code: [module.Class, {x: 1, y: [1.5, 'two']}]
+"""
+
+bad = """
+- id: a
+  desc: [unclosed
+"""
+
+# not accepted by the safe loaders
+tagged = """
+- id: a
+  desc: An entry
+  code: [module.Class, {x: !!python/tuple [1, 2]}]
+"""
+
+
+def load_with(filename, use_libyaml):
+    previous = ConfToolsGlobal.use_libyaml
+    ConfToolsGlobal.use_libyaml = use_libyaml
+    try:
+        return list(load_entries_from_file(filename))
+    except SyntaxMistake as e:
+        return str(e)
+    finally:
+        ConfToolsGlobal.use_libyaml = previous
+
+
+def test_libyaml_same_results():
+    with create_test_environment({'good.yaml': good,
+                                  'bad.yaml': bad,
+                                  'tagged.yaml': tagged}) as dirname:
+        for name in ['good.yaml', 'bad.yaml', 'tagged.yaml']:
+            filename = os.path.join(dirname, name)
+            fast = load_with(filename, True)
+            slow = load_with(filename, False)
+            assert fast == slow, (fast, slow)
+
+
+class Records(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_without_libyaml():
+    # As if PyYAML was built without libyaml
+    previous = formats.CSafeLoader, formats.FormatsGlobal.logged_no_libyaml
+    formats.CSafeLoader = None
+    formats.FormatsGlobal.logged_no_libyaml = False
+    records = Records()
+    logger = logging.getLogger('conf_tools')
+    logger.addHandler(records)
+    level = logger.level
+    logger.setLevel(logging.INFO)
+    try:
+        with create_test_environment({'tagged.yaml': tagged,
+                                      'bad.yaml': bad}) as dirname:
+            filename = os.path.join(dirname, 'tagged.yaml')
+            entries = load_with(filename, True)
+            assert entries[0][1]['code'][1]['x'] == (1, 2)
+            assert load_with(filename, False) == entries
+            filename = os.path.join(dirname, 'bad.yaml')
+            assert 'Cannot parse YAML' in load_with(filename, True)
+        logged = [m for m in records.messages if 'without libyaml' in m]
+        assert len(logged) == 1, records.messages
+    finally:
+        formats.CSafeLoader, formats.FormatsGlobal.logged_no_libyaml = previous
+        logger.removeHandler(records)
+        logger.setLevel(level)
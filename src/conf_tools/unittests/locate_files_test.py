@@ -0,0 +1,57 @@
+import os
+
+from conf_tools.unittests.utils import create_tmp_dir
+from conf_tools.utils import locate_files
+
+
+def write(filename):
+    dirname = os.path.dirname(filename)
+    if not os.path.exists(dirname):
+        os.makedirs(dirname)
+    with open(filename, 'w') as f:
+        f.write('- id: x\n')
+
+
+def test_locate_files():
+    with create_tmp_dir() as d:
+        d = os.path.realpath(d)
+        for f in ['b/2.yaml', 'a/1.yaml', 'a/1.json', 'a/notes.txt',
+                  '.git/x.yaml', 'sub/node_modules/y.yaml']:
+            write(os.path.join(d, f))
+        # aliases
+        os.symlink(os.path.join(d, 'a'), os.path.join(d, 'z-link'))
+        # a loop
+        os.symlink(d, os.path.join(d, 'b', 'loop'))
+
+        found = locate_files(d, '*.yaml')
+        expected = [os.path.join(d, 'a/1.yaml'), os.path.join(d, 'b/2.yaml')]
+        assert found == expected, found
+
+        found = locate_files(d, ['*.yaml', '*.json'])
+        assert found == sorted(expected + [os.path.join(d, 'a/1.json')]), found
+
+        found = locate_files(d, '*.yaml', exclude=[])
+        assert os.path.join(d, '.git/x.yaml') in found, found
+
+        found = locate_files(d, '*', include_directories=True,
+                             include_files=False, followlinks=False)
+        # b/loop is d itself
+        expected = [d] + [os.path.join(d, x) for x in ['a', 'b', 'sub']]
+        assert found == expected, found
+
+
+def test_locate_files_symlinks():
+    # The real paths are returned, as the relative "file:" fields
+    # are resolved with respect to the directory of the file.
+    with create_tmp_dir() as d:
+        d = os.path.realpath(d)
+        write(os.path.join(d, 'data', 'a.robots.yaml'))
+        write(os.path.join(d, 'more', 'b.robots.yaml'))
+        os.mkdir(os.path.join(d, 'cfg'))
+        os.symlink(os.path.join(d, 'data', 'a.robots.yaml'),
+                   os.path.join(d, 'cfg', 'a.robots.yaml'))
+        os.symlink(os.path.join(d, 'more'), os.path.join(d, 'cfg', 'more'))
+        found = locate_files(os.path.join(d, 'cfg'), '*.yaml')
+        expected = [os.path.join(d, 'data', 'a.robots.yaml'),
+                    os.path.join(d, 'more', 'b.robots.yaml')]
+        assert found == expected, found
@@ -0,0 +1,31 @@
+import os
+
+from conf_tools import GlobalConfig
+from conf_tools.unittests.utils import (count_file_reads,
+    create_test_environment, new_master, write_file)
+from conf_tools.utils import get_directory_index
+
+
+config = {
+    'a.robots.yaml': '- id: r1\n  desc: robot\n  code: c\n',
+}
+
+
+def test_overlapping_roots():
+    with count_file_reads() as parsed:
+        with create_test_environment(config) as dirname:
+            sub = os.path.join(dirname, 'sub')
+            os.mkdir(sub)
+            write_file(sub, 'b.robots.yaml',
+                       '- id: r2\n  desc: robot\n  code: c\n')
+
+            master = new_master(None)
+            GlobalConfig.global_load_dir(dirname)
+            master.load(dirname + '/')
+            master.load(sub)
+            master.load(os.path.join(sub, '..', 'sub'))
+
+            walks = get_directory_index().walks
+            assert sorted(master.robots) == ['r1', 'r2']
+            assert len(parsed) == 2, parsed
+            assert get_directory_index().walks == walks + 1
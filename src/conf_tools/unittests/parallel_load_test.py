@@ -0,0 +1,111 @@
+from concurrent.futures import ThreadPoolExecutor
+import gc
+import os
+import weakref
+
+from conf_tools import (ConfigMaster, GlobalConfig, ParallelLoader,
+    SemanticMistake, register_format)
+from conf_tools.formats import FormatsGlobal
+from conf_tools.unittests.utils import create_test_environment
+from nose.plugins.skip import SkipTest
+
+
+good = dict(('f%02d.things.yaml' % i,
+             '- id: "t${x}-%d"\n  desc: "template"\n  code: c\n'
+             '- id: t%d\n  desc: "entry"\n  code: [c, {}]\n' % (i, i))
+            for i in range(20))
+
+duplicate = {
+    'a.things.yaml': '- id: same\n  desc: one\n  code: c\n',
+    'b.things.yaml': '- id: same\n  desc: two\n  code: c\n',
+}
+
+
+def load(dirname, loader):
+    GlobalConfig.clear_for_tests()
+    master = ConfigMaster('parallel')
+    master.add_class('things', '*.things.yaml')
+    master.set_loader(loader)
+    master.load(dirname)
+    things = master.things
+    try:
+        things.make_sure_everything_read()
+    except SemanticMistake as e:
+        return str(e)
+    return dict(things.items()), things.templates, things.entry2file
+
+
+def check_same_as_sequential(files, loader):
+    with create_test_environment(files) as dirname:
+        expected = load(dirname, None)
+        obtained = load(dirname, loader)
+    assert expected == obtained
+
+
+def test_parallel_threads():
+    loader = ParallelLoader(parse_executor=ThreadPoolExecutor(4))
+    check_same_as_sequential(good, loader)
+    check_same_as_sequential(duplicate, loader)
+
+
+def test_parallel_processes():
+    loader = ParallelLoader()
+    try:
+        check_same_as_sequential(good, loader)
+    finally:
+        loader.shutdown()
+
+
+def is_shut_down(executor):
+    try:
+        executor.submit(int)
+    except RuntimeError:
+        return True
+    return False
+
+
+def test_parallel_context_manager():
+    with ParallelLoader() as loader:
+        check_same_as_sequential(good, loader)
+        executors = list(loader._owned)
+        assert len(executors) == 2
+    assert loader._owned == [] and loader.parse_executor is None
+    assert all(is_shut_down(e) for e in executors)
+
+
+def test_parallel_finalizer():
+    if not hasattr(weakref, 'finalize'):
+        raise SkipTest('weakref.finalize not available')
+    loader = ParallelLoader()
+    check_same_as_sequential(good, loader)
+    executors = list(loader._owned)
+    GlobalConfig.clear_for_tests()
+    del loader
+    gc.collect()
+    assert all(is_shut_down(e) for e in executors)
+
+
+def load_key_values(filename, data):
+    """ One entry per line, as "id desc". """
+    return [dict(id=str(line.split()[0]), desc=str(line.split()[1]),
+                 code=['c', {}])
+            for line in data.decode('utf-8').splitlines()]
+
+
+def test_parallel_formats_changed():
+    with create_test_environment(good) as dirname:
+        with ParallelLoader() as loader:
+            # the workers are started before the format is registered
+            load(dirname, loader)
+            with open(os.path.join(dirname, 'a.things.kv'), 'w') as f:
+                f.write('k1 one\nk2 two\n')
+            register_format('.kv', load_key_values)
+            try:
+                GlobalConfig.clear_for_tests()
+                master = ConfigMaster('parallel')
+                master.add_class('things', '*.things.kv')
+                master.set_loader(loader)
+                master.load(dirname)
+                assert master.things['k2']['desc'] == 'two'
+            finally:
+                del FormatsGlobal.loaders['.kv']
@@ -24,3 +24,7 @@ def test_pickling():
         master.load(dirname)
         s = BytesIO()
         pickle.dump(master, s)
+        master2 = pickle.loads(s.getvalue())
+        vehicles = master2.vehicles
+        assert dict.keys(vehicles) == dict.keys(master.vehicles)
+        assert sorted(vehicles) == sorted(master.vehicles)
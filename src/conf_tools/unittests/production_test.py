@@ -0,0 +1,30 @@
+import os
+import subprocess
+import sys
+
+from conf_tools import ObjectSpec
+from conf_tools.utils import expand_string, in_production_mode
+
+
+script = """
+from conf_tools import ObjectSpec
+from conf_tools.utils import expand_string, in_production_mode
+assert in_production_mode()
+assert not hasattr(ObjectSpec.__getitem__, '__contracts__')
+assert not hasattr(expand_string, '__contracts__')
+assert expand_string('a*', ['a1', 'b1', 'a2']) == ['a1', 'a2']
+"""
+
+
+def test_production_mode():
+    env = dict(os.environ)
+    env['CONF_TOOLS_PRODUCTION'] = '1'
+    env['PYTHONPATH'] = os.pathsep.join(sys.path)
+    subprocess.check_call([sys.executable, '-c', script], env=env)
+
+
+def test_checked_mode():
+    if in_production_mode():
+        return
+    assert hasattr(ObjectSpec.__getitem__, '__contracts__')
+    assert hasattr(expand_string, '__contracts__')
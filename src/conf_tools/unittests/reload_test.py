@@ -0,0 +1,134 @@
+import os
+
+from conf_tools import (ConfigMaster, ConfigWatcher, GlobalConfig, 
+    SemanticMistake, SyntaxMistake)
+from conf_tools.unittests.utils import create_test_environment, write_file
+
+
+config = {
+    'a.robots.yaml': '- id: r1\n  desc: robot\n  code: [c, {x: 1}]\n',
+    'b.robots.yaml': """
+- id: "r-${n}"
+  desc: template
+  code: [c, {x: "${n}"}]
+""",
+}
+
+
+def test_reload_changed():
+    GlobalConfig.clear_for_tests()
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('robots')
+        master.add_class('robots', '*.robots.yaml')
+        master.load(dirname)
+        robots = master.robots
+
+        assert robots['r1']['code'][1]['x'] == 1
+        assert robots['r-2']['code'][1]['x'] == 2
+        assert robots.reload_changed() == ([], [], [])
+
+        # modified file
+        write_file(dirname, 'a.robots.yaml',
+                   '- id: r1\n  desc: robot\n  code: [c, {x: 2}]\n')
+        # new file
+        write_file(dirname, 'c.robots.yaml',
+                   '- id: r3\n  desc: robot\n  code: c\n')
+        added, modified, deleted = robots.reload_changed()
+        assert len(added) == 1 and len(modified) == 1 and not deleted
+        assert robots['r1']['code'][1]['x'] == 2
+        assert 'r3' in robots
+
+        # deleted file
+        os.unlink(os.path.join(dirname, 'c.robots.yaml'))
+        assert master.reload_changed()['robots'][2]
+        assert not 'r3' in robots
+
+        # a changed template changes the entries derived from it
+        write_file(dirname, 'b.robots.yaml', """
+- id: "r-${n}"
+  desc: template
+  code: [c, {y: "${n}"}]
+""")
+        robots.reload_changed()
+        assert robots['r-2']['code'][1] == {'y': 2}
+
+
+def test_reload_while_iterating():
+    GlobalConfig.clear_for_tests()
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('robots')
+        master.add_class('robots', '*.robots.yaml')
+        master.load(dirname)
+        robots = master.robots
+        robots.set_domain('n', [1, 2])
+        # the ids are a snapshot: a reload does not affect the loops
+        for ids, expected in [(iter(robots), ['r1']),
+                              (robots.iterate_ids(), ['r1', 'r-1', 'r-2'])]:
+            first = next(ids)
+            write_file(dirname, 'c.robots.yaml',
+                       '- id: r3\n  desc: robot\n  code: c\n')
+            robots.reload_changed()
+            assert [first] + list(ids) == expected
+            os.unlink(os.path.join(dirname, 'c.robots.yaml'))
+            robots.reload_changed()
+
+
+def expect(exception, f):
+    try:
+        f()
+    except exception:
+        return
+    raise Exception('Expected %s.' % exception.__name__)
+
+
+def test_reload_errors():
+    GlobalConfig.clear_for_tests()
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('robots')
+        master.add_class('robots', '*.robots.yaml')
+        master.load(dirname)
+        robots = master.robots
+        assert 'r1' in robots
+
+        # a syntax error in one of the new files
+        write_file(dirname, 'c.robots.yaml',
+                   '- id: r3\n  desc: robot\n  code: c\n')
+        write_file(dirname, 'd.robots.yaml', '- id: [r4\n')
+        expect(SyntaxMistake, robots.reload_changed)
+        assert not 'r3' in robots
+        write_file(dirname, 'd.robots.yaml',
+                   '- id: r4\n  desc: robot\n  code: c\n')
+        added, _, _ = robots.reload_changed()
+        assert len(added) == 2
+        assert 'r3' in robots and 'r4' in robots
+
+        # a repeated entry: nothing changes
+        write_file(dirname, 'a.robots.yaml',
+                   '- id: r3\n  desc: robot\n  code: [c, {x: 5}]\n')
+        expect(SemanticMistake, robots.reload_changed)
+        assert robots['r1']['code'][1]['x'] == 1
+        assert robots['r-2']['code'][1]['x'] == 2
+        # and it is tried again when fixed
+        write_file(dirname, 'a.robots.yaml',
+                   '- id: r1\n  desc: robot\n  code: [c, {x: 5}]\n')
+        _, modified, _ = robots.reload_changed()
+        assert len(modified) == 1
+        assert robots['r1']['code'][1]['x'] == 5
+
+
+def test_watcher_check():
+    GlobalConfig.clear_for_tests()
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('robots')
+        master.add_class('robots', '*.robots.yaml')
+        master.load(dirname)
+
+        changes = []
+        watcher = ConfigWatcher(master, use_inotify=False,
+                                callback=changes.append)
+        assert watcher.check() is None
+        write_file(dirname, 'c.robots.yaml',
+                   '- id: r3\n  desc: robot\n  code: c\n')
+        assert watcher.check() is not None
+        assert len(changes) == 1
+        assert 'r3' in master.robots
@@ -0,0 +1,127 @@
+import threading
+import time
+
+from conf_tools import (ConfigMaster, ConfToolsException, SemanticMistake, 
+    instantiate_spec_resolved)
+from conf_tools.unittests.utils import create_test_environment
+
+
+class Barrier(object):
+    """ The parts of threading.Barrier we use (not in Python 2). """
+
+    def __init__(self, parties, timeout):
+        self.parties = parties
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.reset()
+
+    def reset(self):
+        with self.condition:
+            self.arrived = 0
+
+    def wait(self):
+        with self.condition:
+            self.arrived += 1
+            self.condition.notify_all()
+            # Python 2's Condition.wait() does not say if it timed out
+            deadline = time.time() + self.timeout
+            while self.arrived < self.parties:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise RuntimeError('Timed out waiting at the barrier.')
+                self.condition.wait(remaining)
+
+
+# The three parts of the planner wait for each other: if they were not
+# built concurrently, the barrier would time out.
+barrier = Barrier(3, timeout=10)
+
+
+class Part(object):
+
+    def __init__(self, name, meet=False, **parts):
+        if meet:
+            barrier.wait()
+        self.name = name
+        self.parts = parts
+
+
+class Other(object):
+
+    def __init__(self, name):
+        self.name = name
+
+
+PART = 'conf_tools.unittests.resolve_test.Part'
+OTHER = 'conf_tools.unittests.resolve_test.Other'
+
+config = {
+    'a.parts.yaml': """
+- id: model
+  desc: a model
+  code: [%(part)s, {name: model, meet: true}]
+- id: planner
+  desc: uses the model twice
+  code:
+  - %(part)s
+  - name: planner
+    model: {$ref: model}
+    other: {$ref: "parts:model"}
+    sensor: [%(part)s, {name: sensor, meet: true}]
+    filter: [%(part)s, {name: filter, meet: true}]
+- id: wrong
+  desc: not a Part
+  code: [%(other)s, {name: wrong}]
+- id: uses-wrong
+  desc: refers to the wrong one
+  code: [%(part)s, {name: x, wrong: {$ref: wrong}}]
+- id: loop-a
+  desc: cycle
+  code: [%(part)s, {name: a, b: {$ref: loop-b}}]
+- id: loop-b
+  desc: cycle
+  code: [%(part)s, {name: b, a: {$ref: loop-a}}]
+""" % dict(part=PART, other=OTHER),
+}
+
+
+def test_resolve():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('resolve')
+        master.add_class_generic('parts', '*.parts.yaml', Part)
+        master.load(dirname)
+        parts = master.parts
+        parts.enable_instance_cache()
+
+        barrier.reset()
+        planner = parts.instance_resolved('planner')
+        assert planner.name == 'planner'
+        # shared
+        assert planner.parts['model'] is planner.parts['other']
+        assert planner.parts['sensor'].name == 'sensor'
+        # built by the spec, so cached as instance() does
+        assert parts.instance('planner') is planner
+
+        # the type is checked also for the references
+        try:
+            parts.instance_resolved('uses-wrong')
+        except ConfToolsException as e:
+            assert "'wrong'" in str(e) and 'Other' in str(e)
+        else:
+            raise Exception('Expected ConfToolsException.')
+
+        try:
+            parts.instance_resolved('loop-a')
+        except SemanticMistake as e:
+            assert 'parts:loop-a -> parts:loop-b -> parts:loop-a' in str(e)
+        else:
+            raise Exception('Expected SemanticMistake.')
+
+
+def test_resolve_code_spec():
+    code = [PART, {'name': 'x',
+                   'l': [[PART, {'name': 'y'}], 1],
+                   'z': [PART, {'name': 'y'}]}]
+    x = instantiate_spec_resolved(code)
+    assert x.parts['l'][1] == 1
+    assert x.parts['l'][0] is x.parts['z']
@@ -0,0 +1,95 @@
+from conf_tools.patterns import TemplateDispatcher, pattern_matches
+
+
+templates = [
+    'r-${robot}',
+    'r-${robot}-x',
+    'r-${id_robot}-${n}',
+    'r-${a}-${b}',  # ties with the previous one
+    'Y${id_nuisance}${robot}',
+    '${robot}-nuisance',
+    'd.${x}',  # the dot matches any character
+    's-${n}-${n}',
+    'plain-${x}',
+]
+
+keys = ['r-ciao', 'r-ciao-x', 'r-ab1-2', 'r-a-b-c', 'Yrp1R1', 'x-nuisance',
+        'd.1', 'dx1', 's-1-1', 's-1-2', 'plain-', 'plain-z', 'none']
+
+
+def brute_force(templates, key):
+    """ The original algorithm: try all the templates. """
+    possibilities = []
+    for template in templates:
+        matches = pattern_matches(template, key)
+        if matches:
+            score = -sum(len(x) for x in matches.values())
+            possibilities.append((score, template, matches))
+    if not possibilities:
+        return None, None
+    possibilities.sort(key=lambda p: (-p[0]))
+    best = possibilities[0][0]
+    ties = [p[1] for p in possibilities if p[0] == best]
+    if len(ties) >= 2:
+        return 'tie', ties
+    return possibilities[0][1], possibilities[0][2]
+
+
+def lookup(dispatcher, key):
+    try:
+        return dispatcher.lookup(key)
+    except ValueError as e:
+        assert 'Detected a tie' in str(e)
+        return 'tie', str(e)
+
+
+def check_same(selected):
+    dispatcher = TemplateDispatcher()
+    for t in selected:
+        dispatcher.add(t)
+    for key in keys:
+        expected = brute_force(selected, key)
+        obtained = lookup(dispatcher, key)
+        if expected[0] == 'tie':
+            assert obtained[0] == 'tie', (key, obtained)
+            assert repr(expected[1]) in obtained[1], (expected, obtained)
+        else:
+            assert obtained == expected, (selected, key, obtained, expected)
+
+
+def test_dispatcher_same_as_brute_force():
+    check_same(templates)
+    # only the plain ones
+    plain = [t for t in templates if not t in ['d.${x}', 's-${n}-${n}']]
+    check_same(plain)
+    check_same(list(reversed(plain)))
+
+
+def test_dispatcher_remove():
+    dispatcher = TemplateDispatcher()
+    for t in templates:
+        dispatcher.add(t)
+    dispatcher.remove('r-${a}-${b}')
+    dispatcher.remove('d.${x}')
+    assert not 'd.${x}' in dispatcher
+    assert len(dispatcher) == len(templates) - 2
+    assert dispatcher.lookup('r-ab1-2')[0] == 'r-${id_robot}-${n}'
+    assert dispatcher.lookup('dx1') == (None, None)
+
+
+def test_dispatcher_rivals():
+    dispatcher = TemplateDispatcher()
+    for t in ['ab${x}', 'a${x}b', 'c${x}b', 'r-${a}', 'r-${a}-${b}']:
+        dispatcher.add(t)
+    # computed when adding: same score, compatible prefix and suffix
+    assert dispatcher.rivals['ab${x}'] == set(['a${x}b'])
+    assert dispatcher.rivals['a${x}b'] == set(['ab${x}'])
+    assert dispatcher.rivals['c${x}b'] == set()
+    assert dispatcher.rivals['r-${a}'] == set()
+    assert lookup(dispatcher, 'abcb')[0] == 'tie'
+    assert dispatcher.lookup('abcd')[0] == 'ab${x}'
+    assert dispatcher.lookup('cdb')[0] == 'c${x}b'
+    dispatcher.remove('a${x}b')
+    assert dispatcher.rivals['ab${x}'] == set()
+    assert dispatcher.lookup('abcb')[0] == 'ab${x}'
+    check_same(['ab${x}', 'a${x}b', 'c${x}b', 'abc${x}', '${x}bc'])
@@ -0,0 +1,49 @@
+from conf_tools.master import ConfigMaster
+from conf_tools.patterns import enumerate_pattern, template_domains
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.robots.yaml': """
+- id: "robot-${size}-${speed}"
+  desc: "A ${size|small=small;big=large} robot"
+  code: [c, {size: "${size|small=1;big=2}", speed: "${speed}"}]
+
+- id: "free-${x}"
+  desc: "Not enumerable"
+  code: [c, {}]
+
+- id: robot-small-slow
+  desc: "defined explicitly"
+  code: [c, {}]
+"""
+}
+
+
+def test_template_domains():
+    domains = template_domains({'a': ['${x|a=1;b=2;c=3}', '${x|c=1;a=2}'],
+                                'b': '${y|0=0;1=1}'})
+    assert domains == {'x': ['a', 'c'], 'y': ['0', '1']}, domains
+
+    ids = [i for i, _ in enumerate_pattern('r-${x}-${y}', domains)]
+    assert ids == ['r-a-0', 'r-a-1', 'r-c-0', 'r-c-1'], ids
+
+
+def test_iterate_ids():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('ids')
+        robots = master.add_class('robots', '*.robots.yaml')
+        master.load(dirname)
+
+        # speed has no domain
+        assert list(robots.iterate_template_ids('robot-${size}-${speed}')) == []
+        robots.set_domain('speed', ['slow', 'fast'])
+        ids = list(robots.iterate_ids())
+        assert ids == ['robot-small-slow', 'robot-small-fast',
+                       'robot-big-slow', 'robot-big-fast'], ids
+        assert robots['robot-big-fast']['code'][1] == dict(size=2,
+                                                           speed='fast')
+
+        assert robots.expand_names('robot-big-*', templates=True) == \
+            ['robot-big-slow', 'robot-big-fast']
+        assert robots.expand_names('robot-*') == ['robot-small-slow']
@@ -0,0 +1,79 @@
+import os
+import pickle
+
+from conf_tools.exceptions import SemanticMistakeKeyNotFound
+from conf_tools.master import ConfigMaster
+from conf_tools.unittests.utils import create_test_environment
+
+
+entries = ''.join('- id: e%03d\n  desc: entry\n  code: c\n' % i
+                  for i in range(100))
+
+config = {
+    'a.things.yaml': entries + """
+- id: "t-${n}"
+  desc: template
+  code: c
+"""
+}
+
+
+def test_missing_keys():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('missing')
+        things = master.add_class('things', '*.things.yaml')
+        master.load(dirname)
+
+        assert not 'x' in things
+        assert 'x' in things.missing_keys
+        try:
+            things['x']
+            assert False
+        except SemanticMistakeKeyNotFound as e:
+            assert e._msg is None
+            s = str(e)
+            assert 'e049' in s and not 'e050' in s
+            assert '100 entries' in s and '50 others' in s
+            # the message survives pickling
+            e2 = pickle.loads(pickle.dumps(e))
+            assert isinstance(e2, SemanticMistakeKeyNotFound)
+            assert str(e2) == s
+
+        # the message describes the spec when it is first needed
+        try:
+            things['y']
+            assert False
+        except SemanticMistakeKeyNotFound as e:
+            assert e.snapshot is None
+            things['e000a'] = dict(id='e000a', desc='new', code='c')
+            s = str(e)
+            assert 'e000a' in s and '101 entries' in s
+            things['e000b'] = dict(id='e000b', desc='new', code='c')
+            assert str(e) == s
+        things.pop('e000b')
+
+        # a template added directly after a miss
+        assert not 'u-1' in things
+        things.templates['u-${n}'] = dict(id='u-${n}', desc='t', code='c')
+        things.entry2file['u-${n}'] = things.entry2file['e000']
+        assert 'u-1' in things
+        del things.templates['u-${n}']
+
+        # the dict methods invalidate the cache
+        assert not 'z' in things
+        things['z'] = dict(id='z', desc='new', code='c')
+        assert 'z' in things
+        del things['z']
+        assert not 'z' in things
+        things.update(z=dict(id='z', desc='new', code='c'))
+        assert 'z' in things
+        things.pop('z')
+        things.pop('e000a')
+
+        # a new entry invalidates the cache
+        with open(os.path.join(dirname, 'b.things.yaml'), 'w') as f:
+            f.write('- id: x\n  desc: new\n  code: c\n')
+        things.reload_changed()
+        assert not things.missing_keys
+        assert 'x' in things
+        assert 't-1' in things
@@ -1,6 +1,6 @@
 from conf_tools.master import ConfigMaster
 from pprint import pformat
-from conf_tools.patterns import pattern_matches
+from conf_tools.patterns import compile_template, pattern_matches
 from conf_tools.unittests.utils import create_test_environment
 
 test_cases = [
@@ -78,3 +78,12 @@ def test_ignoring_partial1():
 def test_ignoring_partial2():
     result = pattern_matches('nuisance-${robot}', 'other-nuisance-myrobot')
     assert result == None, result
+
+
+def test_compiled_template():
+    compiled = compile_template('Y${id_nuisance}${robot}')
+    assert compiled is compile_template('Y${id_nuisance}${robot}')
+    assert compiled.keys == ['id_nuisance', 'robot']
+    result = compiled.match('Yrp1R1')
+    assert result == dict(id_nuisance='rp1', robot='R1'), result
+    assert compiled.match('Xrp1R1') is None
@@ -0,0 +1,51 @@
+from conf_tools.exceptions import SemanticMistake, SyntaxMistake
+from conf_tools.patterns import SubstitutionPlan, recursive_subst
+
+
+template = {
+    'id': "s_rf_f${fov}n${n}d${disp}_n${noiselevel}",
+    'desc': 'Range-finder with ${disp|U=uniform;R=random} disposition.',
+    'code': [
+        "vehicles.library.sensors.${disp|U=RangefinderUniform;R=RangefinderRandom}",
+        {'num_sensels': "${n}",
+         'fov_deg': " ${fov} ",
+         'static': {'a': ' 1.5 ', 'b': '[1, 2]', 'c': None, 'd': 'text'},
+         'noise': ['vehicles.library.noises.AdditiveGaussian',
+                   {'std_dev': "${noiselevel|0=0;1=0.1;2=0.5}"}]},
+    ],
+    'bad_options': ['${n}', '${disp|nonsense}'],
+}
+
+matches = dict(fov='180', n='180', disp='U', noiselevel='2')
+
+
+def result_or_error(f):
+    try:
+        return f()
+    except (SemanticMistake, SyntaxMistake) as e:
+        return type(e), str(e)
+
+
+def test_subst_plan_same_results():
+    good = dict(template)
+    del good['bad_options']
+    plan = SubstitutionPlan(good)
+    expected = recursive_subst(good, **matches)
+    assert plan.apply(matches) == expected
+    # twice, to check it is not modified
+    assert plan.apply(matches) == expected
+
+    # the parts without variables are shared
+    assert plan.apply(matches)['code'][1]['static'] is \
+        plan.apply(matches)['code'][1]['static']
+
+    # errors
+    for m in [dict(matches, disp='X'), dict(fov='1')]:
+        a = result_or_error(lambda: SubstitutionPlan(good).apply(m))
+        b = result_or_error(lambda: recursive_subst(good, **m))
+        assert a == b, (a, b)
+
+    a = result_or_error(lambda: SubstitutionPlan(template).apply(matches))
+    b = result_or_error(lambda: recursive_subst(template, **matches))
+    assert a == b, (a, b)
+    assert a[0] == SyntaxMistake
@@ -0,0 +1,78 @@
+import os
+import time
+
+from conf_tools.master import ConfigMaster
+from conf_tools.objspec import ObjectSpec
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': """
+- id: "t-${n}"
+  desc: template
+  code: [c, {n: "${n}", l: [1, 2]}]
+"""
+}
+
+
+def test_template_cache():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('cache')
+        things = master.add_class('things', '*.things.yaml')
+        master.load(dirname)
+
+        a = things['t-1']
+        assert (things.template_cache_hits, things.template_cache_misses) == (0, 1)
+        a['code'][1]['l'].append(3)
+        b = things['t-1']
+        assert (things.template_cache_hits, things.template_cache_misses) == (1, 1)
+        assert b['code'][1] == {'n': 1, 'l': [1, 2]}, b
+        b['code'][1]['n'] = 'changed'
+        assert things['t-1']['code'][1]['n'] == 1
+
+        # bounded
+        previous = ObjectSpec.template_cache_size
+        ObjectSpec.template_cache_size = 2
+        try:
+            for k in ['t-2', 't-3', 't-4']:
+                things[k]
+            assert list(things.template_cache) == ['t-3', 't-4']
+        finally:
+            ObjectSpec.template_cache_size = previous
+
+        # invalidated when the template is reloaded
+        filename = os.path.join(dirname, 'a.things.yaml')
+        with open(filename, 'w') as f:
+            f.write('- id: "t-${n}"\n  desc: template\n  code: [d, {}]\n')
+        t = time.time() + 10
+        os.utime(filename, (t, t))
+        things.reload_changed()
+        assert things['t-4']['code'] == ['d', {}]
+
+
+def test_templates_changed_directly():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('cache')
+        things = master.add_class('things', '*.things.yaml')
+        master.load(dirname)
+        assert things['t-1']['code'][0] == 'c'
+
+        # replaced under the same name
+        things.templates['t-${n}'] = {'id': 't-${n}', 'desc': 'new',
+                                      'code': ['d', {}]}
+        assert things['t-1']['code'] == ['d', {}]
+
+        # one removed and another added: same number of templates
+        del things.templates['t-${n}']
+        things.entry2file['u-${n}'] = things.entry2file['t-${n}']
+        things.entry2file['v-${n}'] = things.entry2file['t-${n}']
+        things.templates['u-${n}'] = {'id': 'u-${n}', 'desc': 'u',
+                                      'code': ['e', {}]}
+        assert things['u-1']['code'] == ['e', {}]
+        assert not 't-1' in things
+
+        # replaced altogether
+        things.templates = {'v-${n}': {'id': 'v-${n}', 'desc': 'v',
+                                       'code': ['f', {}]}}
+        assert things['v-1']['code'] == ['f', {}]
+        assert not 'u-1' in things
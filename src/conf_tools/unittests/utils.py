@@ -1,8 +1,10 @@
-from conf_tools.master import GlobalConfig
+from conf_tools import load_entries
+from conf_tools.master import ConfigMaster, GlobalConfig
 from contextlib import contextmanager
 from nose.tools import nottest
 import os
 import tempfile
+import time
 
 
 @contextmanager
@@ -24,3 +26,44 @@ def create_test_environment(files):
                 f.write(contents)
 
         yield dirname
+
+
+@contextmanager
+def count_file_reads():
+    """ Yields the list of the files parsed, as they are parsed. """
+    parsed = []
+    original = load_entries.load_entries_from_file
+
+    def spy(filename):
+        parsed.append(filename)
+        return original(filename)
+
+    load_entries.load_entries_from_file = spy
+    try:
+        yield parsed
+    finally:
+        load_entries.load_entries_from_file = original
+
+
+def new_master(dirname, classes=('robots',), name='test'):
+    """ 
+        Returns a new ConfigMaster with the classes "*.<class>.yaml",
+        after loading the directory (if not None).
+    """
+    GlobalConfig.clear_for_tests()
+    master = ConfigMaster(name)
+    for c in classes:
+        master.add_class(c, '*.%s.yaml' % c)
+    if dirname is not None:
+        master.load(dirname)
+    return master
+
+
+def write_file(dirname, name, contents):
+    """ Writes the file, making sure that its modification time changes. """
+    filename = os.path.join(dirname, name)
+    with open(filename, 'w') as f:
+        f.write(contents)
+    t = time.time() + 10
+    os.utime(filename, (t, t))
+    return filename
@@ -0,0 +1,45 @@
+from conf_tools import ConfigMaster, collect_code_names
+from conf_tools.instantiate_utils import ImportNameGlobal
+from conf_tools.unittests.utils import create_test_environment
+
+
+config = {
+    'a.things.yaml': """
+- id: a
+  desc: nested
+  code: [xml.dom.minidom.parseString, {x: [json.dumps, {}]}]
+- id: "t-${n}"
+  desc: template
+  code: [fractions.Fraction, {numerator: "${n}"}]
+- id: "u-${n}"
+  desc: unknown name
+  code: ["mod${n}.f", {}]
+- id: bad
+  desc: missing module
+  code: [not_existing_module.f, {}]
+""",
+}
+
+
+def test_warmup():
+    with create_test_environment(config) as dirname:
+        master = ConfigMaster('warmup')
+        master.add_class('things', '*.things.yaml')
+        master.load(dirname)
+        names = collect_code_names(master)
+        assert names == ['fractions.Fraction', 'json.dumps',
+                         'not_existing_module.f',
+                         'xml.dom.minidom.parseString'], names
+
+        progress = []
+        warmup = master.warmup(callback=lambda *args: progress.append(args))
+        warmup.join()
+        assert warmup.done()
+        assert list(warmup.errors) == ['not_existing_module.f']
+        assert sorted(warmup.timings) == ['fractions.Fraction', 'json.dumps',
+                                          'xml.dom.minidom.parseString']
+        assert [p[1] for p in progress] == [0, 1, 2, 3]
+        assert 'json.dumps' in ImportNameGlobal.resolved
+
+        warmup = master.warmup(background=False)
+        assert warmup.done() and warmup.thread is None
@@ -3,6 +3,7 @@ from .. import logger
 from .col_logging import *
 from .friendly_paths import *
 from .locate_files_imp import *
+from .dir_index import *
 from .terminal_size import *
 
 from .indent_string import *
@@ -10,6 +11,8 @@ from .indent_string import *
 from .expansion import *
 from .wildcards import *
 from .pickling import *
+from .production import *
+from .frozen import *
 from .not_found import *
 
 from .term_color import *
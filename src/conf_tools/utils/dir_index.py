@@ -0,0 +1,94 @@
+from .locate_files_imp import (DEFAULT_EXCLUDE, compile_patterns, remove_aliases,
+    scan_directory)
+import os
+import threading
+
+__all__ = [
+    'DirectoryIndex',
+    'get_directory_index',
+]
+
+
+class DirectoryIndex(object):
+    """
+        Process-wide cache of the contents of the configuration directories.
+
+        Each root is walked only once; the listing is then shared by
+        all the specs of all the masters, each one filtering it with
+        its own pattern. The listing is reused until invalidate()
+        is called for that root.
+    """
+
+    def __init__(self, followlinks=True, exclude=None):
+        """
+            :param followlinks: Whether to follow symlinks to directories.
+            :param exclude: Directories not to visit (see locate_files()).
+        """
+        self.followlinks = followlinks
+        self.exclude = exclude
+        # real path of directory -> list of (filename, (st_dev, st_ino))
+        self._listings = {}
+        # pattern -> compiled pattern
+        self._patterns = {}
+        self._lock = threading.Lock()
+        # Number of directory walks done
+        self.walks = 0
+
+    def __repr__(self):
+        return 'DirectoryIndex(%s)' % sorted(self._listings)
+
+    def listing(self, directory):
+        """ Returns the list of (filename, (st_dev, st_ino)) for all files. """
+        real = os.path.realpath(directory)
+        with self._lock:
+            if not real in self._listings:
+                self._listings[real] = self._walk(real)
+                self.walks += 1
+            return self._listings[real]
+
+    def _walk(self, directory):
+        return [(path, key) for path, is_dir, key
+                in scan_directory(directory, self.followlinks, self.exclude)
+                if not is_dir]
+
+    def locate_files(self, directory, pattern):
+        """ Same as locate_files(directory, pattern), using the listing. """
+        key = tuple(pattern) if isinstance(pattern, list) else pattern
+        if not key in self._patterns:
+            self._patterns[key] = compile_patterns(pattern)
+        matches = self._patterns[key]
+        found = [(path, k) for path, k in self.listing(directory)
+                 if matches(os.path.basename(path))]
+        return remove_aliases(directory, found)
+
+    def invalidate(self, directory=None):
+        """ Forgets the listing of the directory (or of all directories). """
+        with self._lock:
+            if directory is None:
+                self._listings = {}
+            else:
+                self._listings.pop(os.path.realpath(directory), None)
+
+    def covers(self, root, directory):
+        """
+            Returns True if the walk of root visits directory, that is,
+            if directory is equal to or inside root, and not inside
+            an excluded directory. Both must be real paths.
+        """
+        if directory == root:
+            return True
+        if not directory.startswith(root.rstrip(os.sep) + os.sep):
+            return False
+        exclude = self.exclude if self.exclude is not None else DEFAULT_EXCLUDE
+        is_excluded = compile_patterns(exclude)
+        relative = os.path.relpath(directory, root)
+        return not any(is_excluded(x) for x in relative.split(os.sep))
+
+
+class DirectoryIndexGlobal(object):
+    index = DirectoryIndex()
+
+
+def get_directory_index():
+    """ Returns the process-wide DirectoryIndex. """
+    return DirectoryIndexGlobal.index
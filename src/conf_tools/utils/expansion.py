@@ -1,5 +1,5 @@
 from conf_tools import logger
-from contracts import contract
+from .production import contract
 import os
 
 __all__ = [
@@ -0,0 +1,90 @@
+from copy import deepcopy
+import sys
+
+__all__ = [
+    'FrozenDict',
+    'FrozenList',
+    'freeze',
+    'thaw',
+    'register_frozen_representers',
+]
+
+
+def read_only(*args, **kwargs):
+    msg = 'This object is read-only; use get_mutable() to obtain a copy.'
+    raise TypeError(msg)
+
+
+class FrozenDict(dict):
+    """
+        A dict that cannot be modified. Being a subclass of dict, it
+        can be used wherever a dict is expected.
+    """
+    __setitem__ = __delitem__ = read_only
+    clear = pop = popitem = setdefault = update = read_only
+    __ior__ = read_only
+
+    def __repr__(self):
+        return 'FrozenDict(%s)' % dict.__repr__(self)
+
+    def __reduce__(self):
+        return FrozenDict, (dict(self),)
+
+
+class FrozenList(list):
+    """
+        A list that cannot be modified. Being a subclass of list, it
+        can be used wherever a list is expected.
+    """
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = read_only
+    append = extend = insert = pop = remove = reverse = sort = read_only
+    clear = read_only
+
+    def __repr__(self):
+        return 'FrozenList(%s)' % list.__repr__(self)
+
+    def __reduce__(self):
+        return FrozenList, (list(self),)
+
+
+def freeze(x):
+    """
+        Returns a read-only version of x, where all the dicts
+        and lists (recursively) are replaced by FrozenDict and FrozenList.
+        The other values are shared.
+    """
+    if isinstance(x, FrozenDict) or isinstance(x, FrozenList):
+        return x
+    if isinstance(x, dict):
+        return FrozenDict((k, freeze(v)) for k, v in x.items())
+    if isinstance(x, list):
+        return FrozenList(freeze(v) for v in x)
+    return x
+
+
+def thaw(x):
+    """
+        Returns a modifiable deep copy of x, where the dicts
+        and lists (frozen or not) are plain dicts and lists.
+    """
+    if isinstance(x, dict):
+        return dict((k, thaw(v)) for k, v in x.items())
+    if isinstance(x, list):
+        return [thaw(v) for v in x]
+    return deepcopy(x)
+
+
+def register_frozen_representers():
+    """ 
+        Makes PyYAML write the frozen objects as plain dicts and lists.
+        This is called by conf_tools.formats, so that PyYAML is not 
+        imported before it is needed.
+    """
+    import yaml
+    for dumper in [yaml.Dumper, yaml.SafeDumper]:
+        yaml.add_representer(FrozenDict, dumper.represent_dict, Dumper=dumper)
+        yaml.add_representer(FrozenList, dumper.represent_list, Dumper=dumper)
+
+
+if 'yaml' in sys.modules:
+    register_frozen_representers()
@@ -1,51 +1,142 @@
 from . import logger
-from collections import defaultdict
-from contracts import contract
+from .production import contract
 import fnmatch
 import os
+import re
+
+try:
+    from os import scandir
+except ImportError:  # Python 2
+    from scandir import scandir  # @UnresolvedImport
 
 __all__ = [
     'locate_files',
+    'scan_directory',
+    'DEFAULT_EXCLUDE',
 ]
 
+# Names (or patterns) of the directories that are never visited.
+# It can be modified, or overridden using the "exclude" argument.
+DEFAULT_EXCLUDE = ['.git', '.hg', '.svn', '__pycache__', 'node_modules']
+
 
 @contract(returns='list(str)', directory='str',
-          pattern='str', followlinks='bool')
+          pattern='str|list(str)', followlinks='bool')
 def locate_files(directory, pattern, followlinks=True,
                  include_directories=False,
-                 include_files=True):
+                 include_files=True,
+                 exclude=None):
+    """
+        Returns the sorted list of files (and/or directories) in the
+        tree whose name matches the pattern (or one of the patterns).
+
+        Directories matching one of the patterns in exclude (default:
+        DEFAULT_EXCLUDE) are not visited. Files that are reachable
+        from more than one path (because of symlinks) are returned once.
+    """
     #print('locate_files %r %r' % (directory, pattern))
-    filenames = []
-    
-    for root, dirnames, files in os.walk(directory, followlinks=followlinks):
-        if include_files:
-            for f in files:
-                if fnmatch.fnmatch(f, pattern):
-                    filename = os.path.join(root, f)
-                    filenames.append(filename)
-
-        if include_directories:
-            for d in dirnames:
-                if fnmatch.fnmatch(d, pattern):
-                    filename = os.path.join(root, d)
-                    filenames.append(filename)
-
-
-    real2norm = defaultdict(lambda: [])
-    for norm in filenames:
-        real = os.path.realpath(norm)
-        real2norm[real].append(norm)
-        # print('%s -> %s' % (real, norm))
-
-    for k, v in real2norm.items():
-        if len(v) > 1:
+    matches = compile_patterns(pattern)
+    found = []
+    for path, is_dir, key in scan_directory(directory, followlinks, exclude):
+        if is_dir and not include_directories:
+            continue
+        if not is_dir and not include_files:
+            continue
+        if matches(os.path.basename(path)):
+            found.append((path, key))
+
+    return remove_aliases(directory, found)
+
+
+def compile_patterns(patterns):
+    """
+        Compiles a shell pattern, or a list of them, into a function
+        name -> match or None.
+    """
+    if isinstance(patterns, str):
+        patterns = [patterns]
+    if not patterns:
+        return lambda _: None
+    translated = [fnmatch.translate(os.path.normcase(p)) for p in patterns]
+    regexp = re.compile('|'.join('(?:%s)' % t for t in translated))
+    return lambda name: regexp.match(os.path.normcase(name))
+
+
+def scan_directory(directory, followlinks=True, exclude=None):
+    """
+        Yields tuples (path, is_dir, key) for the files and the
+        directories in the tree, where key = (st_dev, st_ino)
+        identifies the file.
+
+        The paths are real paths (the symlinks are resolved), and the
+        tree is visited in sorted order. Directories are visited once,
+        even if there are symlink loops.
+    """
+    if exclude is None:
+        exclude = DEFAULT_EXCLUDE
+    is_excluded = compile_patterns(exclude)
+
+    root = os.path.realpath(directory)
+    st = os.stat(root)
+    visited = set([(st.st_dev, st.st_ino)])
+    # stack of (directory, st_dev)
+    stack = [(root, st.st_dev)]
+    while stack:
+        dirname, dev = stack.pop()
+        try:
+            entries = sorted(scandir(dirname), key=lambda e: e.name)
+        except OSError:  # like os.walk(), ignore unreadable directories
+            continue
+
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                is_symlink = entry.is_symlink()
+                if is_dir or is_symlink:
+                    st = entry.stat()
+                    key = (st.st_dev, st.st_ino)
+                else:
+                    # inode() does not need a system call
+                    key = (dev, entry.inode())
+            except OSError:  # broken link
+                continue
+
+            path = entry.path
+            if is_symlink:
+                # The real path: the "file:" fields are relative to
+                # the directory of the real file.
+                path = os.path.realpath(path)
+
+            if is_dir:
+                if is_excluded(entry.name):
+                    continue
+                yield path, True, key
+                if (followlinks or not is_symlink) and not key in visited:
+                    visited.add(key)
+                    subdirs.append((path, key[0]))
+            else:
+                yield path, False, key
+
+        stack.extend(reversed(subdirs))
+
+
+def remove_aliases(directory, found):
+    """
+        Given a list of (path, key), returns the sorted list of paths,
+        keeping only the first path for each key.
+    """
+    key2paths = {}
+    for path, key in found:
+        key2paths.setdefault(key, []).append(path)
+
+    for paths in key2paths.values():
+        if len(paths) > 1:
             msg = 'In directory:\n\t%s\n' % directory
-            msg += 'I found %d paths that refer to the same file:\n'
-            for n in v:
+            msg += 'I found %d paths that refer to the same file:\n' % len(paths)
+            for n in paths:
                 msg += '\t%s\n' % n
-            msg += 'refer to the same file:\n\t%s\n' % k
             msg += 'I will silently eliminate redundancies.'
-            logger.warning(v)
-
-    return list(real2norm.keys())
+            logger.warning(msg)
 
+    return sorted(paths[0] for paths in key2paths.values())
@@ -0,0 +1,34 @@
+import os
+
+from contracts import all_disabled, contract as contracts_contract
+
+__all__ = [
+    'in_production_mode',
+]
+
+
+class ProductionMode(object):
+    # If True, the @contract decorators of conf_tools are not applied, so
+    # that the functions in the hot paths (__getitem__, instance(),
+    # expand_string(), ...) are bound without any checks.
+    # The decorators are applied at import time, so this must be decided
+    # before importing conf_tools: set the environment variable
+    # CONF_TOOLS_PRODUCTION=1, or call contracts.disable_all().
+    enabled = os.environ.get('CONF_TOOLS_PRODUCTION', '') not in ['', '0']
+
+
+def in_production_mode():
+    """ Returns True if the conf_tools functions are not checked. """
+    return ProductionMode.enabled or all_disabled()
+
+
+def contract(*args, **kwargs):
+    """ 
+        Same as contracts.contract, but returns the function undecorated
+        in production mode. 
+    """
+    if in_production_mode():
+        if len(args) == 1 and not kwargs and callable(args[0]):
+            return args[0]
+        return lambda f: f
+    return contracts_contract(*args, **kwargs)
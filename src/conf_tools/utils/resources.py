@@ -1,5 +1,5 @@
 from contracts.utils import raise_wrapped
-from contracts import contract
+from .production import contract
 import os
 
 __all__ = [
@@ -1,9 +1,9 @@
 import six
 
-from contracts import contract
+from .production import contract
 import re
 
-__all__ = ['expand_string', 'get_wildcard_matches']
+__all__ = ['expand_string', 'expand_string_lazy', 'get_wildcard_matches']
 
 
 def flatten(seq):
@@ -32,6 +32,33 @@ def expand_string(x, options):
         assert False
 
 
+def expand_string_lazy(x, universe):
+    """
+        Same as expand_string(), but universe is a function that, given
+        a wildcard, returns an iterable over the options to match;
+        for example a generator, so that the options are never all
+        in memory.
+    """
+    if isinstance(x, list):
+        return flatten(expand_string_lazy(y, universe) for y in x)
+    elif isinstance(x, six.string_types):
+        x = x.strip()
+        if ',' in x:
+            splat = [_ for _ in x.split(',') if _]  # remove empty
+            return flatten(expand_string_lazy(y, universe) for y in splat)
+        elif '*' in x:
+            regexp = wildcard_to_regexp(x)
+            expanded = [y for y in universe(x) if regexp.match(y)]
+            if not expanded:
+                msg = 'Could not find matches for pattern %r.' % x
+                raise ValueError(msg)
+            return expanded
+        else:
+            return [x]
+    else:
+        assert False
+
+
 def wildcard_to_regexp(arg):
     """ Returns a regular expression from a shell wildcard expression. """
     return re.compile('\A' + arg.replace('*', '.*') + '\Z')
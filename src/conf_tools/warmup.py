@@ -0,0 +1,120 @@
+from collections import OrderedDict
+import threading
+import time
+
+from . import logger
+from .instantiate_utils import import_name
+from .resolve import is_code_spec
+
+__all__ = [
+    'Warmup',
+    'collect_code_names',
+]
+
+
+def collect_code_names(master):
+    """
+        Returns the sorted list of the distinct names of functions and
+        classes in the "code" fields of all entries and templates of the
+        ConfigMaster, including the code specs nested in the parameters.
+    """
+    names = set()
+    for spec in master.specs.values():
+        spec.make_sure_everything_read()
+        for entry in list(dict.values(spec)) + list(spec.templates.values()):
+            if isinstance(entry, dict):
+                find_code_names(entry.get('code', None), names)
+    return sorted(names)
+
+
+def find_code_names(x, names):
+    if is_code_spec(x):
+        # the names obtained from templates are not known yet
+        if not '${' in x[0]:
+            names.add(x[0])
+        find_code_names(x[1], names)
+    elif isinstance(x, dict):
+        for v in x.values():
+            find_code_names(v, names)
+    elif isinstance(x, list):
+        for v in x:
+            find_code_names(v, names)
+
+
+class Warmup(object):
+    """
+        Imports the modules needed by the code specs, so that the
+        first instantiation does not pay for it.
+
+        Usage: ..
+
+            warmup = master.warmup()  # in a background thread
+            ...
+            warmup.join()
+            print(warmup.timings)
+
+        or, before forking the workers: ..
+
+            master.warmup(background=False)
+    """
+
+    def __init__(self, names, callback=None):
+        """
+            :param names: The dotted names to import.
+            :param callback: Called as callback(name, i, n, seconds, error)
+                after each name (error is None if successful).
+        """
+        self.names = names
+        self.callback = callback
+        # name -> seconds, for the names imported
+        self.timings = OrderedDict()
+        # name -> error message, for the names that could not be imported
+        self.errors = OrderedDict()
+        self.thread = None
+
+    def __repr__(self):
+        return ('Warmup(%d/%d done, %d errors)' %
+                (len(self.timings) + len(self.errors), len(self.names),
+                 len(self.errors)))
+
+    def start(self):
+        """ Imports the names in a daemon thread. """
+        self.thread = threading.Thread(target=self.run,
+                                       name='conf_tools-warmup')
+        self.thread.daemon = True
+        self.thread.start()
+        return self
+
+    def join(self, timeout=None):
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def done(self):
+        return len(self.timings) + len(self.errors) == len(self.names)
+
+    def run(self):
+        """ Imports the names in this thread. """
+        n = len(self.names)
+        t_start = time.time()
+        for i, name in enumerate(self.names):
+            t0 = time.time()
+            error = None
+            try:
+                import_name(name)
+            except Exception as e:
+                error = '%s' % e
+            seconds = time.time() - t0
+            if error is None:
+                self.timings[name] = seconds
+                logger.debug('warmup: %d/%d %s (%.3f s)' % (i + 1, n, name,
+                                                            seconds))
+            else:
+                self.errors[name] = error
+                logger.warning('warmup: %d/%d could not import %s:\n%s' %
+                               (i + 1, n, name, error))
+            if self.callback is not None:
+                self.callback(name, i, n, seconds, error)
+        logger.info('warmup: imported %d names in %.3f s (%d errors)' %
+                    (len(self.timings), time.time() - t_start,
+                     len(self.errors)))
+        return self
@@ -0,0 +1,178 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import threading
+import time
+
+from . import logger
+from .utils import scan_directory
+
+__all__ = [
+    'ConfigWatcher',
+]
+
+
+class Inotify(object):
+    """
+        Minimal wrapper around the Linux inotify API, used only to
+        know that something changed in the watched directories.
+    """
+    IN_MODIFY = 0x2
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM |
+            IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF)
+
+    @staticmethod
+    def available():
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            return hasattr(libc, 'inotify_init1')
+        except OSError:
+            return False
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1() failed')
+
+    def add_watch(self, dirname):
+        path = dirname.encode(sys.getfilesystemencoding())
+        # Adding the same directory again is harmless.
+        self.libc.inotify_add_watch(self.fd, path, self.MASK)
+
+    def wait(self, timeout):
+        """ Returns True if there were events within the timeout. """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        self.drain()
+        return True
+
+    def drain(self):
+        while True:
+            try:
+                if not os.read(self.fd, 65536):
+                    break
+            except OSError:  # EAGAIN: nothing left
+                break
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher(object):
+    """
+        Watches the directories loaded by a ConfigMaster and calls
+        reload_changed() when something changes.
+
+        On Linux inotify is used to wake up as soon as a file changes;
+        otherwise (or if use_inotify is False) the files are polled
+        every `interval` seconds.
+
+        Usage: ..
+
+            watcher = ConfigWatcher(master)
+            watcher.start()
+            ...
+            watcher.stop()
+    """
+
+    def __init__(self, master, interval=1.0, use_inotify=True, callback=None):
+        """
+            :param master: The ConfigMaster to watch.
+            :param interval: Seconds between two checks when polling.
+            :param callback: Function called with the dict returned by
+                ConfigMaster.reload_changed() when something changed.
+        """
+        self.master = master
+        self.interval = interval
+        self.use_inotify = use_inotify and Inotify.available()
+        self.callback = callback
+        self._stop = threading.Event()
+        self._thread = None
+        self._inotify = None
+
+    def __repr__(self):
+        return 'ConfigWatcher(%s,inotify=%s)' % (self.master.name,
+                                                 self.use_inotify)
+
+    def start(self):
+        """ Starts the watching thread. """
+        for spec in self.master.specs.values():
+            spec.make_sure_everything_read()
+        if self.use_inotify:
+            self._inotify = Inotify()
+            self._add_watches()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='ConfigWatcher')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """ Stops the watching thread. """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def check(self):
+        """
+            Reloads the changed files.
+            Returns the changes, or None if nothing changed.
+        """
+        changes = self.master.reload_changed()
+        if not any(any(x) for x in changes.values()):
+            return None
+        if self._inotify is not None:
+            # There might be new directories
+            self._add_watches()
+        if self.callback is not None:
+            self.callback(changes)
+        return changes
+
+    def _roots(self):
+        roots = set()
+        for spec in self.master.specs.values():
+            roots.update(spec.roots_read)
+        return sorted(roots)
+
+    def _add_watches(self):
+        for root in self._roots():
+            self._inotify.add_watch(root)
+            for path, is_dir, _ in scan_directory(root):
+                if is_dir:
+                    self._inotify.add_watch(path)
+
+    def _run(self):
+        while not self._stop.is_set():
+            if self._inotify is not None:
+                if self._inotify.wait(self.interval):
+                    # Let the editors finish writing
+                    time.sleep(0.005)
+                    self._inotify.drain()
+            else:
+                self._stop.wait(self.interval)
+            if self._stop.is_set():
+                break
+            try:
+                self.check()
+            except Exception as e:
+                logger.error('Could not reload the configuration: %s' % e)